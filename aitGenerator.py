@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+
+# Share of AITs per recovery tier when the default 6 tiers are used
+DEFAULT_TIER_WEIGHTS = [0.05, 0.10, 0.20, 0.25, 0.25, 0.15]
+
+# Rounds of redrawing repeated links; the few still repeated after that (rows
+# linked to nearly every other AIT) are dropped
+MAX_RESAMPLE_ROUNDS = 20
+
+
+# Spreadsheet-style names: 0 -> A, 25 -> Z, 26 -> AA, ...
+def business_letters(count):
+    names = []
+    for i in range(count):
+        name = ''
+        i += 1
+        while i:
+            i, rem = divmod(i - 1, 26)
+            name = chr(65 + rem) + name
+        names.append(name)
+    return names
+
+
+# Number of links per AIT for the chosen degree distribution
+def _degrees(rng, num_ait, mean, distribution, hub_exponent, max_degree):
+    if distribution == 'fixed':
+        degrees = np.full(num_ait, mean)
+    elif distribution == 'poisson':
+        degrees = rng.poisson(mean, size=num_ait)
+    elif distribution == 'powerlaw':
+        # Pareto tail scaled so the mean stays close to `mean`
+        scale = mean * (hub_exponent - 1) / hub_exponent if hub_exponent > 1 else mean
+        degrees = np.floor(scale * (rng.pareto(hub_exponent, size=num_ait) + 1))
+    else:
+        raise ValueError(f"Unknown degree distribution {distribution!r}")
+    return np.clip(degrees, 0, min(max_degree, num_ait - 1)).astype(np.int64)
+
+
+# Random link targets for every (row, slot), never pointing at the row itself
+def _targets(rng, rows, num_ait, popularity):
+    if popularity is None:
+        targets = rng.integers(0, num_ait - 1, size=len(rows))
+        targets += targets >= rows  # skip over the row itself
+    else:
+        targets = rng.choice(num_ait, size=len(rows), p=popularity)
+        targets[targets == rows] = (targets[targets == rows] + 1) % num_ait
+    return targets
+
+
+# Mask of the first occurrence of every key
+def _first_occurrences(keys):
+    first = np.zeros(len(keys), dtype=bool)
+    first[np.unique(keys, return_index=True)[1]] = True
+    return first
+
+
+# Split a flat, row-ordered array into one Python list per row
+def _to_lists(values, rows, num_ait):
+    offsets = np.zeros(num_ait + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=num_ait), out=offsets[1:])
+    flat = values.tolist()
+    return [flat[offsets[i]:offsets[i + 1]] for i in range(num_ait)]
+
+
+# Vectorised synthetic AIT inventory. Same columns as the original sample data
+# (plus 'status'); upstream and downstream never overlap and never contain the
+# AIT itself. degree_distribution is 'fixed', 'poisson' or 'powerlaw' (hubs);
+# with 'fixed' every AIT gets exactly fan_in and fan_out links as long as
+# fan_in + fan_out < num_ait.
+def generate_ait_data(num_ait, seed=None, fan_in=3, fan_out=3, degree_distribution='fixed',
+                      hub_exponent=2.5, max_degree=1000, num_businesses=None, num_tiers=6,
+                      online_ratio=0.9):
+    rng = np.random.default_rng(seed)
+    ids = np.arange(1, num_ait + 1, dtype=np.int64)
+
+    if num_ait < 2:
+        up_rows = down_rows = up_targets = down_targets = np.empty(0, dtype=np.int64)
+    else:
+        # Power-law graphs also get skewed popularity so a few AITs become hubs
+        popularity = None
+        if degree_distribution == 'powerlaw':
+            weights = rng.pareto(hub_exponent, size=num_ait) + 1
+            popularity = weights / weights.sum()
+
+        up_rows = np.repeat(np.arange(num_ait), _degrees(rng, num_ait, fan_in, degree_distribution, hub_exponent, max_degree))
+        down_rows = np.repeat(np.arange(num_ait), _degrees(rng, num_ait, fan_out, degree_distribution, hub_exponent, max_degree))
+        rows = np.concatenate([up_rows, down_rows])
+        targets = _targets(rng, rows, num_ait, popularity)
+
+        # Redraw repeated links inside a row and downstream links that are
+        # already upstream, so rows keep their degree: np.unique keeps the
+        # first occurrence and upstream comes first
+        keep = _first_occurrences(rows * num_ait + targets)
+        for _ in range(MAX_RESAMPLE_ROUNDS):
+            if keep.all():
+                break
+            repeated = np.flatnonzero(~keep)
+            targets[repeated] = _targets(rng, rows[repeated], num_ait, popularity)
+            keep = _first_occurrences(rows * num_ait + targets)
+        up_targets, down_targets = targets[:len(up_rows)], targets[len(up_rows):]
+        keep_up, keep_down = keep[:len(up_rows)], keep[len(up_rows):]
+        up_rows, up_targets = up_rows[keep_up], up_targets[keep_up]
+        down_rows, down_targets = down_rows[keep_down], down_targets[keep_down]
+
+    # Business sizes follow a Zipf-like curve, a few large and many small ones
+    if num_businesses is None:
+        num_businesses = max(1, int(np.sqrt(num_ait)))
+    business_weights = 1.0 / np.arange(1, num_businesses + 1)
+    business_codes = rng.choice(num_businesses, size=num_ait, p=business_weights / business_weights.sum())
+    business_names = np.array([f"Business {name}" for name in business_letters(num_businesses)], dtype=object)
+
+    if num_tiers == len(DEFAULT_TIER_WEIGHTS):
+        tier_weights = np.array(DEFAULT_TIER_WEIGHTS)
+    else:
+        tier_weights = np.full(num_tiers, 1.0 / num_tiers)
+    tier_codes = rng.choice(num_tiers, size=num_ait, p=tier_weights)
+    tier_names = np.array([f"tier {i + 1}" for i in range(num_tiers)], dtype=object)
+
+    data = {
+        "ait_name": np.char.add('AIT', ids.astype(str)).astype(object),
+        "id": ids,
+        "upstream": _to_lists(ids[up_targets], up_rows, num_ait),
+        "downstream": _to_lists(ids[down_targets], down_rows, num_ait),
+        "risk_factor": rng.integers(1, 6, size=num_ait),
+        "recovery_time": tier_names[tier_codes],
+        "business_name": business_names[business_codes],
+        "status": np.where(rng.random(num_ait) < online_ratio, 'online', 'offline').astype(object)
+    }
+    return pd.DataFrame(data)
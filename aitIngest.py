@@ -0,0 +1,290 @@
+import argparse
+import csv
+import hashlib
+import itertools
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from entityStore import LIST_COLUMNS
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet caching is skipped without pyarrow
+    pa = None
+    pq = None
+
+DEFAULT_CHUNKSIZE = 100_000
+
+# Directory of the Parquet caches when ingest() is given no cache_dir
+CACHE_DIR_ENV = 'AIT_INGEST_CACHE'
+
+# List cell cleanup in one translate pass: brackets and quotes are removed and
+# ';' / '|' separators become ','. Blanks are stripped per token afterwards, so
+# ids may contain inner spaces.
+_LIST_TABLE = str.maketrans(';|', ',,', "[]()'\"")
+# Joins the cells of a chunk; never part of an id
+_CELL_SEPARATOR = '\x1e'
+
+# Parquet schema metadata key holding the fingerprint of the source file
+_SOURCE_KEY = b'ait_source'
+
+logger = logging.getLogger(__name__)
+
+
+# Tokenise a column of list cells into flat tokens plus CSR offsets. Cells may
+# be Python lists, "['1', '2']" / "[1, 2]" strings, "1;2" / "1|2" strings or
+# empty/NaN. Ids themselves must not contain separators, quotes or brackets;
+# blanks around them are dropped.
+def tokenize_list_column(values):
+    cells = []
+    for cell in values:
+        if isinstance(cell, str):
+            cells.append(cell)
+        elif isinstance(cell, (list, tuple, np.ndarray)):
+            cells.append(','.join(map(str, cell)))
+        else:  # NaN / None
+            cells.append('')
+
+    # Clean and split the whole column as one string instead of cell by cell
+    cells = _CELL_SEPARATOR.join(cells).translate(_LIST_TABLE).split(_CELL_SEPARATOR)
+    counts = np.fromiter(map(str.count, cells, itertools.repeat(',')), dtype=np.int64, count=len(cells)) + 1
+    tokens = np.array([token.strip() for token in ','.join(cells).split(',')], dtype=object)
+
+    rows = np.repeat(np.arange(len(cells)), counts)
+    keep = tokens != ''
+    offsets = np.zeros(len(cells) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows[keep], minlength=len(cells)), out=offsets[1:])
+    return tokens[keep], offsets
+
+
+# One Python list per row from flat values and CSR offsets
+def split_lists(values, offsets):
+    flat = values.tolist()
+    return [flat[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+
+# Convenience for callers holding a single column (e.g. the multipage sample)
+def parse_list_column(values, dtype=None):
+    tokens, offsets = tokenize_list_column(values)
+    return split_lists(_cast_tokens(tokens, dtype, 'list'), offsets)
+
+
+def _cast_tokens(tokens, dtype, column):
+    if dtype is None or dtype.kind not in 'iu':
+        return tokens.astype(str)
+    try:
+        return tokens.astype(np.int64)
+    except ValueError:
+        bad = next(t for t in tokens if not str(t).lstrip('-').isdigit())
+        raise ValueError(f"Non-integer id {bad!r} in column {column!r}") from None
+
+
+# Fail on missing or duplicate ids
+def validate_ids(ids, id_column='id'):
+    ids = pd.Series(ids)
+    if ids.isna().any():
+        raise ValueError(f"{int(ids.isna().sum())} rows without an {id_column!r}")
+    duplicated = ids.duplicated()
+    if duplicated.any():
+        raise ValueError(f"Duplicate ids, e.g. {ids[duplicated].iloc[0]!r} ({int(duplicated.sum())} in total)")
+
+
+# Drop list entries that reference ids outside the inventory. Returns the new
+# (values, offsets) and the number of dropped references.
+def drop_unknown_references(values, offsets, index):
+    known = index.get_indexer(pd.Index(values)) >= 0 if len(values) else np.empty(0, dtype=bool)
+    dropped = int((~known).sum())
+    if dropped:
+        rows = np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+        offsets = np.zeros(len(offsets), dtype=np.int64)
+        np.cumsum(np.bincount(rows[known], minlength=len(offsets) - 1), out=offsets[1:])
+        values = values[known]
+    return values, offsets, dropped
+
+
+# Chunks of rows from an xlsx sheet, read in streaming (read-only) mode
+def _read_xlsx_chunks(path, chunksize, sheet_name=None):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name else workbook.active
+        rows = sheet.iter_rows(values_only=True)
+        header = [str(name) for name in next(rows)]
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunksize:
+                yield pd.DataFrame(chunk, columns=header)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header)
+    finally:
+        workbook.close()
+
+
+# Chunks of rows from a delimited text file; the delimiter is sniffed
+def _read_text_chunks(path, chunksize):
+    with open(path, newline='') as f:
+        sample = f.read(64 * 1024)
+    try:
+        delimiter = csv.Sniffer().sniff(sample.splitlines()[0], delimiters=',\t;').delimiter
+    except (csv.Error, IndexError):
+        delimiter = ','
+    yield from pd.read_csv(path, sep=delimiter, chunksize=chunksize)
+
+
+# Spreadsheet exports are sometimes plain text with an .xlsx name, so the
+# format is decided by the zip signature rather than the extension
+def read_chunks(path, chunksize=DEFAULT_CHUNKSIZE, sheet_name=None):
+    with open(path, 'rb') as f:
+        is_zip = f.read(4) == b'PK\x03\x04'
+    if is_zip:
+        return _read_xlsx_chunks(path, chunksize, sheet_name)
+    return _read_text_chunks(path, chunksize)
+
+
+def _source_fingerprint(path):
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}".encode()
+
+
+# Parquet cache of a source file: <name>.parquet in cache_dir, or in a shared
+# cache directory (AIT_INGEST_CACHE, else one under the system temp dir)
+# with a hash of the source path added so equally named exports do not clash
+def cache_path_for(path, cache_dir=None):
+    name = os.path.splitext(os.path.basename(path))[0]
+    if cache_dir is None:
+        cache_dir = os.environ.get(CACHE_DIR_ENV) or os.path.join(tempfile.gettempdir(), 'ait-ingest')
+        name += '-' + hashlib.blake2b(os.path.abspath(path).encode(), digest_size=4).hexdigest()
+    os.makedirs(cache_dir, exist_ok=True)
+    return os.path.join(cache_dir, name + '.parquet')
+
+
+# Write the inventory as Parquet with native list<> columns, tagged with the
+# source fingerprint so a changed export invalidates it
+def write_parquet(dataframe, cache_path, source_path=None):
+    table = pa.Table.from_pandas(dataframe, preserve_index=False)
+    if source_path is not None:
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                               _SOURCE_KEY: _source_fingerprint(source_path)})
+    tmp_path = cache_path + '.tmp'
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, cache_path)
+
+
+# Read a Parquet inventory; list columns come back as Python lists straight
+# from the Arrow offsets/values buffers. None if the cache is stale.
+def read_parquet(cache_path, source_path=None):
+    if source_path is not None:
+        metadata = pq.read_schema(cache_path).metadata or {}
+        if metadata.get(_SOURCE_KEY) != _source_fingerprint(source_path):
+            return None
+    table = pq.read_table(cache_path)
+    columns = {}
+    for name in table.column_names:
+        column = table.column(name)
+        if pa.types.is_list(column.type):
+            column = column.combine_chunks()
+            offsets = column.offsets.to_numpy().astype(np.int64)
+            values = column.values.to_numpy(zero_copy_only=False)
+            columns[name] = split_lists(values[offsets[0]:offsets[-1]], offsets - offsets[0])
+        else:
+            columns[name] = column.to_pandas()
+    return pd.DataFrame(columns)
+
+
+# Parse one raw chunk: list columns become flat tokens + offsets
+def _parse_chunk(chunk):
+    parsed = {}
+    for column in LIST_COLUMNS:
+        if column in chunk.columns:
+            parsed[column] = tokenize_list_column(chunk[column].to_numpy())
+    return chunk.drop(columns=list(parsed)), parsed
+
+
+# Read an AIT inventory (xlsx/CSV/Parquet) into a DataFrame with Python list
+# upstream/downstream columns. Text and spreadsheet sources are parsed in
+# chunks, validated and cached as Parquet in cache_dir (by default a shared
+# cache directory, see cache_path_for) so later starts skip parsing. Returns (dataframe, stats) where stats reports
+# rows, seconds and rows_per_second.
+def ingest(path, cache_dir=None, chunksize=DEFAULT_CHUNKSIZE, sheet_name=None, use_cache=True):
+    start = time.perf_counter()
+    source = 'parquet'
+    dataframe = None
+
+    if path.endswith('.parquet'):
+        dataframe = read_parquet(path)
+    elif use_cache and pq is not None:
+        cache_path = cache_path_for(path, cache_dir)
+        if os.path.exists(cache_path):
+            dataframe = read_parquet(cache_path, source_path=path)
+            source = 'cache'
+
+    dangling = {}
+    if dataframe is None:
+        source = 'parse'
+        frames = []
+        tokens = {column: [] for column in LIST_COLUMNS}
+        offsets = {column: [] for column in LIST_COLUMNS}
+        for chunk in read_chunks(path, chunksize, sheet_name):
+            frame, parsed = _parse_chunk(chunk)
+            frames.append(frame)
+            for column, (chunk_tokens, chunk_offsets) in parsed.items():
+                tokens[column].append(chunk_tokens)
+                offsets[column].append(chunk_offsets)
+        dataframe = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+        index = None
+        if 'id' in dataframe.columns:
+            validate_ids(dataframe['id'])
+            index = pd.Index(dataframe['id'])
+        for column in LIST_COLUMNS:
+            if not tokens[column]:
+                continue
+            # Stitch the per-chunk CSR arrays back together
+            lengths = np.concatenate([np.diff(chunk_offsets) for chunk_offsets in offsets[column]])
+            column_offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=column_offsets[1:])
+            values = np.concatenate(tokens[column])
+            if index is not None:
+                values = _cast_tokens(values, index.dtype, column)
+                values, column_offsets, dangling[column] = drop_unknown_references(values, column_offsets, index)
+                if dangling[column]:
+                    logger.warning("Dropped %d %s references to unknown ids", dangling[column], column)
+            dataframe[column] = split_lists(values, column_offsets)
+
+        if use_cache and pq is not None:
+            write_parquet(dataframe, cache_path_for(path, cache_dir), source_path=path)
+
+    seconds = time.perf_counter() - start
+    stats = {
+        'rows': len(dataframe),
+        'seconds': seconds,
+        'rows_per_second': len(dataframe) / seconds if seconds > 0 else float('inf'),
+        'source': source,
+        'dangling_references': dangling,
+    }
+    logger.info("Ingested %d rows from %s (%s) in %.2fs, %.0f rows/s",
+                stats['rows'], path, source, seconds, stats['rows_per_second'])
+    return dataframe, stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Ingest an AIT inventory export and cache it as Parquet")
+    parser.add_argument('path')
+    parser.add_argument('--cache-dir')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--sheet')
+    parser.add_argument('--no-cache', action='store_true', help="Always parse the source and do not write a cache")
+    args = parser.parse_args()
+
+    dataframe, stats = ingest(args.path, args.cache_dir, args.chunksize, args.sheet, not args.no_cache)
+    print(f"{stats['rows']:,d} rows in {stats['seconds']:.2f}s "
+          f"({stats['rows_per_second']:,.0f} rows/s, from {stats['source']})")
@@ -0,0 +1,145 @@
+import importlib
+import logging
+import os
+import threading
+import time
+
+import dash
+from dash import dcc, html, Input, Output
+import dash_bootstrap_components as dbc
+from flask import jsonify
+
+from callbackMetrics import instrument
+from entityStore import get_store
+
+logger = logging.getLogger(__name__)
+
+# Build every page in a background thread right after startup, so the first
+# visitor of a page does not pay for it (pages already built are skipped).
+# Set APP_SHELL_WARM_UP=0 to turn it off, e.g. when a pre-fork server builds
+# the pages in its master process instead (see wsgi.py).
+WARM_UP = os.environ.get('APP_SHELL_WARM_UP', '1') != '0'
+
+# (path, module, title) of every page; every module is imported with the shell,
+# so its callbacks (registered with the global `dash.callback`) are in place
+# before the first request. It must define `layout` as a function or a
+# component, and may define STORE_NAME: its layout is then rebuilt whenever
+# that store is reloaded or edited.
+PAGE_MODULES = [
+    ('/', 'scatterPlot', "3D Scatter"),
+    ('/scatter-lines', 'scatterWithLine', "3D Scatter with Lines"),
+    ('/network', 'dashCytoscapeNetwork', "AIT Network"),
+]
+
+
+# One page of the shell: imported once and built once per data version of
+# its store, with the time each step took
+class Page:
+    def __init__(self, path, module_name, title):
+        self.path = path
+        self.module_name = module_name
+        self.title = title
+        self.module = None
+        self.layout = None
+        self.layout_version = None
+        self.import_seconds = None
+        self.build_seconds = None
+        self.built_by = None
+        self.error = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            if self.module is None:
+                start = time.perf_counter()
+                self.module = importlib.import_module(self.module_name)
+                self.import_seconds = time.perf_counter() - start
+                logger.info("Imported page %s (%s) in %.3fs", self.path, self.module_name, self.import_seconds)
+            return self.module
+
+    # Version of the data the layout shows, None for a page without a store
+    def data_version(self):
+        store_name = getattr(self.load(), 'STORE_NAME', None)
+        return get_store(store_name).data_version if store_name is not None else None
+
+    def build(self, built_by='request'):
+        module = self.load()
+        version = self.data_version()
+        with self._lock:
+            if self.layout is None or version != self.layout_version:
+                start = time.perf_counter()
+                layout = module.layout
+                self.layout = layout() if callable(layout) else layout
+                self.layout_version = version
+                self.build_seconds = time.perf_counter() - start
+                self.built_by = built_by
+                logger.info("Built page %s in %.3fs (%s)", self.path, self.build_seconds, built_by)
+            return self.layout
+
+    def timings(self):
+        return {
+            'module': self.module_name,
+            'title': self.title,
+            'imported': self.module is not None,
+            'built': self.layout is not None,
+            'layout_version': self.layout_version,
+            'import_seconds': self.import_seconds,
+            'build_seconds': self.build_seconds,
+            'built_by': self.built_by,
+            'error': self.error,
+        }
+
+
+pages = {path: Page(path, module_name, title) for path, module_name, title in PAGE_MODULES}
+
+app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True)
+instrument(app)
+
+# Dash takes over the `dash.callback` callbacks (and sets up background job
+# cancellation) on its first request, so every page module is imported now.
+# Importing is cheap: data is loaded and layouts are built on first use.
+for _page in pages.values():
+    _page.load()
+
+
+def warm_up(built_by='warm-up'):
+    for page in pages.values():
+        try:
+            page.build(built_by=built_by)
+        except Exception as error:
+            page.error = repr(error)
+            logger.exception("Warming up page %s failed", page.path)
+
+
+app.layout = html.Div([
+    dcc.Location(id='url'),
+    html.Nav([dcc.Link(page.title, href=page.path, style={'marginRight': '1em'}) for page in pages.values()],
+             style={'padding': '10px'}),
+    html.Div(id='page-content')
+])
+
+
+@app.callback(
+    Output('page-content', 'children'),
+    Input('url', 'pathname')
+)
+def display_page(pathname):
+    page = pages.get(pathname)
+    if page is None:
+        return html.H2("Page not found")
+    return page.build()
+
+
+# Import and build times of every page, and whether a request or the warm-up
+# thread paid for the last build
+@app.server.route('/page-timings')
+def page_timings():
+    return jsonify({path: page.timings() for path, page in pages.items()})
+
+
+if WARM_UP:
+    threading.Thread(target=warm_up, name='page-warm-up', daemon=True).start()
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    app.run(debug=True)
@@ -0,0 +1,114 @@
+import logging
+import os
+import tempfile
+import time
+
+try:
+    import diskcache
+    from dash import DiskcacheManager
+except ImportError:  # callbacks run in the request thread without diskcache
+    diskcache = None
+
+# Directory of the job result cache, shared by all workers on the host
+JOB_CACHE_ENV = 'DASH_JOB_CACHE'
+# Seconds a finished job's result is kept for identical requests
+JOB_RESULT_TTL = 600
+# Seconds an in-flight job may hold its key before others stop waiting for it
+JOB_TIMEOUT = 300
+# Seconds between checks while waiting for another job's result
+WAIT_INTERVAL = 0.1
+
+logger = logging.getLogger(__name__)
+
+_cache = None
+
+
+if diskcache is not None:
+    # Hands every collected job result to on_result in the web process, where
+    # the job's own process cannot reach (e.g. to record callback metrics)
+    class ReportingDiskcacheManager(DiskcacheManager):
+        def __init__(self, cache, on_result=None, **kwargs):
+            super().__init__(cache, **kwargs)
+            self.on_result = on_result
+
+        def get_result(self, key, job):
+            result = super().get_result(key, job)
+            failed = isinstance(result, dict) and 'background_callback_error' in result
+            if self.on_result is not None and result is not self.UNDEFINED and not failed:
+                self.on_result(result)
+            return result
+
+
+# On-disk cache for job results and locks; None without diskcache
+def job_cache():
+    global _cache
+    if diskcache is None:
+        return None
+    if _cache is None:
+        directory = os.environ.get(JOB_CACHE_ENV) or os.path.join(tempfile.gettempdir(), 'dash-jobs')
+        _cache = diskcache.Cache(directory)
+    return _cache
+
+
+# Background callback manager that runs jobs in local subprocesses, with no
+# broker. Results are reused for equal arguments and equal cache_by values
+# (e.g. the dataset version). on_result(result) is called in the web process
+# when the browser collects a result. None when dash[diskcache] is not
+# installed, in which case callers register ordinary callbacks.
+def job_manager(cache_by=None, on_result=None):
+    cache = job_cache()
+    if cache is None:
+        return None
+    try:
+        return ReportingDiskcacheManager(cache, on_result=on_result, cache_by=cache_by, expire=JOB_RESULT_TTL)
+    except ImportError:
+        # DiskcacheManager also needs psutil and multiprocess
+        logger.warning("Background callbacks disabled: dash[diskcache] extras are not installed")
+        return None
+
+
+# True while process `pid` exists (job processes all run on this host)
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # exists, owned by another user
+        return True
+    return True
+
+
+# Run compute() at most once at a time per key across job processes: the first
+# job computes and stores the result, identical jobs started meanwhile wait
+# for it and reuse it instead of repeating the work. The computing job's pid
+# marks the key as in flight; Dash kills superseded and cancelled jobs without
+# any cleanup, so a waiter takes the key over as soon as its holder is gone.
+def shared_result(key, compute, ttl=JOB_RESULT_TTL):
+    cache = job_cache()
+    if cache is None:
+        return compute()
+    key = 'job-result:' + key
+    owner_key = key + ':owner'
+    while True:
+        result = cache.get(key)
+        if result is not None:
+            return result
+        # add() is atomic: only one job becomes the owner
+        if cache.add(owner_key, os.getpid(), expire=JOB_TIMEOUT):
+            break
+        owner = cache.get(owner_key)
+        if owner is not None and not _alive(owner):
+            with cache.transact():
+                if cache.get(owner_key) == owner:
+                    cache.delete(owner_key)
+            continue
+        time.sleep(WAIT_INTERVAL)
+    try:
+        # The previous owner may have finished just before add()
+        result = cache.get(key)
+        if result is None:
+            result = compute()
+            cache.set(key, result, expire=ttl)
+        return result
+    finally:
+        cache.delete(owner_key)
@@ -0,0 +1,247 @@
+import argparse
+import datetime
+import gc
+import json
+import platform
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from plotly.io.json import to_json_plotly
+
+from aitGenerator import generate_ait_data
+from entityStore import load_store
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+# Row caps for benchmarks too slow to run at every size (none at the moment);
+# pass --no-limits to lift the caps
+ROW_LIMITS = {}
+
+
+# AIT frame with string ids, the shape dashCytoscape2 expects
+def _with_string_ids(dataframe):
+    dataframe = dataframe.copy()
+    dataframe['id'] = dataframe['id'].astype(str)
+    dataframe['upstream'] = [[str(i) for i in ids] for ids in dataframe['upstream']]
+    dataframe['downstream'] = [[str(i) for i in ids] for ids in dataframe['downstream']]
+    return dataframe
+
+
+# Synthetic x/y/z points for the 3D scatter pages
+def scatter_data(num_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'x': rng.normal(size=num_rows),
+        'y': rng.normal(size=num_rows),
+        'z': rng.uniform(0, 10, size=num_rows),
+        'label': np.char.add('P', np.arange(num_rows).astype(str)).astype(object),
+        'status': rng.choice(['up', 'down', 'pending'], size=num_rows).astype(object),
+    })
+
+
+# Synthetic city points for the world map
+def city_data(num_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'city': np.char.add('City', np.arange(num_rows).astype(str)).astype(object),
+        'lat': rng.uniform(-60, 75, size=num_rows),
+        'lon': rng.uniform(-180, 180, size=num_rows),
+        'count': rng.integers(1, 200, size=num_rows),
+    })
+
+
+# Every benchmark is (name, setup) where setup(ait_frame, num_rows) prepares
+# the module state and returns the zero-argument call to measure
+def _bench_generate_elements(ait_frame, num_rows):
+    from graphElements import generate_elements
+    from graphIndex import build_graph_index
+    index = build_graph_index(ait_frame)
+    positions = np.arange(len(index))
+    return lambda: generate_elements(index, positions)
+
+
+def _bench_update_graph(ait_frame, num_rows):
+    import dashCytoscapeNetwork
+    dashCytoscapeNetwork.load_dataset(ait_frame)
+
+    # Clear the result cache first so it does not hide the work; no view
+    # token means a full element list rather than a patch
+    def call():
+        dashCytoscapeNetwork.result_cache.clear()
+        elements, _ = dashCytoscapeNetwork.update_graph(3, 'tier 2', 'all', 1, 'both', 'business_name', None, None, None)
+        return elements
+    return call
+
+
+def _bench_update_summary_boxes(ait_frame, num_rows):
+    import updatedNetworkGraph
+    updatedNetworkGraph.load_dataset(ait_frame)
+    update_summary_boxes = updatedNetworkGraph.update_summary_boxes.__wrapped__
+    return lambda: update_summary_boxes('all', 3, 'tier 2', 'all')
+
+
+# Range filters on numeric and categorical columns (count cube path)
+def _bench_update_summary_boxes_range(ait_frame, num_rows):
+    import updatedNetworkGraph
+    updatedNetworkGraph.load_dataset(ait_frame)
+    update_summary_boxes = updatedNetworkGraph.update_summary_boxes.__wrapped__
+    return lambda: update_summary_boxes('all', {'min': 2, 'max': 4}, {'min': 'tier 2', 'max': 'tier 3'}, 'all')
+
+
+def _bench_display_node_details(ait_frame, num_rows):
+    import dashCytoscape2
+    load_store(dashCytoscape2.STORE_NAME, _with_string_ids(ait_frame))
+    selected_id = str(num_rows // 2)
+    return lambda: dashCytoscape2.display_node_details(selected_id)
+
+
+def _bench_scatter_new(ait_frame, num_rows):
+    import newScatter
+    data = scatter_data(num_rows)
+    return lambda: newScatter.create_scatter_plot_with_lines(data)
+
+
+def _bench_scatter_lines(ait_frame, num_rows):
+    import scatterWithLine
+    data = scatter_data(num_rows)
+    return lambda: scatterWithLine.create_scatter_plot_with_lines(data, "Benchmark")
+
+
+def _bench_update_map(ait_frame, num_rows):
+    import worldMapGraphPlotly
+    load_store(worldMapGraphPlotly.STORE_NAME, city_data(num_rows), id_column=None, label_column='city')
+    return lambda: worldMapGraphPlotly.update_map(None, 'clusters', None)[0]
+
+
+# Zoomed into Western Europe: a marker patch for the clusters in view
+def _bench_update_map_zoom(ait_frame, num_rows):
+    import worldMapGraphPlotly
+    load_store(worldMapGraphPlotly.STORE_NAME, city_data(num_rows), id_column=None, label_column='city')
+    relayout_data = {'geo.projection.scale': 12, 'geo.center.lon': 5, 'geo.center.lat': 48}
+    return lambda: worldMapGraphPlotly.update_map(relayout_data, 'clusters', None)[0].to_plotly_json()
+
+
+def _bench_update_map_density(ait_frame, num_rows):
+    import worldMapGraphPlotly
+    load_store(worldMapGraphPlotly.STORE_NAME, city_data(num_rows), id_column=None, label_column='city')
+    return lambda: worldMapGraphPlotly.update_map(None, 'density', None)[0]
+
+
+BENCHMARKS = [
+    ('generate_elements', _bench_generate_elements),
+    ('update_graph', _bench_update_graph),
+    ('update_summary_boxes', _bench_update_summary_boxes),
+    ('update_summary_boxes[range]', _bench_update_summary_boxes_range),
+    ('display_node_details', _bench_display_node_details),
+    ('create_scatter_plot_with_lines[newScatter]', _bench_scatter_new),
+    ('create_scatter_plot_with_lines[scatterWithLine]', _bench_scatter_lines),
+    ('update_map', _bench_update_map),
+    ('update_map[zoom]', _bench_update_map_zoom),
+    ('update_map[density]', _bench_update_map_density),
+]
+
+
+# Time `call` `repeat` times after one warm-up call (per-version work such as
+# the layout is not part of a callback's steady state), then run it once more
+# under tracemalloc for the peak allocation and serialise that result the way
+# Dash would
+def measure(call, repeat):
+    call()
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    result = call()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'wall_seconds': {
+            'min': min(timings),
+            'median': statistics.median(timings),
+            'max': max(timings),
+        },
+        'peak_memory_bytes': peak,
+        'payload_bytes': len(to_json_plotly(result)),
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, repeat, only=None, limits=True, seed=0):
+    results = []
+    for num_rows in sizes:
+        ait_frame = generate_ait_data(num_rows, seed=seed)
+        for name, setup in BENCHMARKS:
+            if only and not any(pattern in name for pattern in only):
+                continue
+            if limits and num_rows > ROW_LIMITS.get(name, num_rows):
+                print(f"{name:50s} {num_rows:>9,d} rows  skipped (over row limit)")
+                continue
+            entry = {'benchmark': name, 'rows': num_rows}
+            entry.update(measure(setup(ait_frame, num_rows), repeat))
+            results.append(entry)
+            print(f"{name:50s} {num_rows:>9,d} rows  "
+                  f"{entry['wall_seconds']['median'] * 1000:10.1f} ms  "
+                  f"{entry['peak_memory_bytes'] / 2**20:8.1f} MiB peak  "
+                  f"{entry['payload_bytes'] / 2**20:8.2f} MiB payload")
+    return {
+        'meta': {
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'repeat': repeat,
+            'seed': seed,
+        },
+        'results': results,
+    }
+
+
+# Print the median-time ratio of every benchmark present in both reports
+def compare(report, baseline):
+    previous = {(r['benchmark'], r['rows']): r for r in baseline['results']}
+    for entry in report['results']:
+        before = previous.get((entry['benchmark'], entry['rows']))
+        if before is None:
+            continue
+        ratio = entry['wall_seconds']['median'] / max(before['wall_seconds']['median'], 1e-12)
+        print(f"{entry['benchmark']:50s} {entry['rows']:>9,d} rows  {ratio:6.2f}x time  "
+              f"{entry['payload_bytes'] - before['payload_bytes']:+,d} payload bytes")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the graph, summary, scatter and map callbacks")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', nargs='+', help="Run benchmarks whose name contains any of these strings")
+    parser.add_argument('--no-limits', action='store_true', help="Ignore ROW_LIMITS")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', help="Previous results JSON to compare against")
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.repeat, args.only, not args.no_limits, args.seed)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
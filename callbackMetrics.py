@@ -0,0 +1,240 @@
+import contextvars
+import cProfile
+import functools
+import heapq
+import io
+import itertools
+import math
+import os
+import pstats
+import random
+import threading
+import time
+
+from dash.exceptions import PreventUpdate
+from flask import Response, request
+
+# Upper bounds of the histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+BYTES_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000, math.inf)
+
+# Share of callback calls run under cProfile (0 = off), e.g. CALLBACK_PROFILE=0.05
+PROFILE_ENV = 'CALLBACK_PROFILE'
+# Profiles of this many of the slowest sampled calls are kept
+MAX_PROFILES = 10
+# Lines of each profile shown by /metrics/profiles
+PROFILE_LINES = 30
+
+PROMETHEUS_MIMETYPE = 'text/plain; version=0.0.4'
+
+_current = contextvars.ContextVar('callback_metrics_current', default=None)
+_wrap_lock = threading.Lock()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def add(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    # Prometheus buckets are cumulative
+    def lines(self, name, labels):
+        lines = []
+        for bound, total in zip(self.buckets, itertools.accumulate(self.counts)):
+            le = '+Inf' if bound == math.inf else repr(bound)
+            lines.append(f'{name}_bucket{{{labels},le="{le}"}} {total}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum!r}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+class CallbackStats:
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.response_bytes = Histogram(BYTES_BUCKETS)
+        self.request_bytes = Histogram(BYTES_BUCKETS)
+        self.errors = 0
+        self.prevented = 0
+        # observe() values: name -> [count, sum, max]
+        self.observed = {}
+
+
+# Latency, payload sizes and observe()d counts of every instrumented callback,
+# plus cProfile output of the slowest sampled calls
+class CallbackMetrics:
+    def __init__(self, profile_rate=0.0):
+        self.profile_rate = profile_rate
+        self.callbacks = {}
+        self.profiles = []  # min-heap of (seconds, sequence, callback, stats text)
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        # Only one profiler can be active at a time
+        self._profile_lock = threading.Lock()
+
+    def _stats(self, name):
+        stats = self.callbacks.get(name)
+        if stats is None:
+            stats = self.callbacks[name] = CallbackStats()
+        return stats
+
+    def record(self, name, seconds, response_bytes, request_bytes, outcome):
+        with self._lock:
+            stats = self._stats(name)
+            stats.latency.add(seconds)
+            if response_bytes is not None:
+                stats.response_bytes.add(response_bytes)
+            if request_bytes is not None:
+                stats.request_bytes.add(request_bytes)
+            if outcome == 'error':
+                stats.errors += 1
+            elif outcome == 'prevented':
+                stats.prevented += 1
+
+    def observe(self, name, metric, value):
+        with self._lock:
+            entry = self._stats(name).observed.setdefault(metric, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += value
+            entry[2] = max(entry[2], value)
+
+    def keep_profile(self, name, seconds, profile):
+        with self._lock:
+            if len(self.profiles) >= MAX_PROFILES and seconds <= self.profiles[0][0]:
+                return
+        text = io.StringIO()
+        pstats.Stats(profile, stream=text).sort_stats('cumulative').print_stats(PROFILE_LINES)
+        with self._lock:
+            entry = (seconds, next(self._sequence), name, text.getvalue())
+            if len(self.profiles) < MAX_PROFILES:
+                heapq.heappush(self.profiles, entry)
+            else:
+                heapq.heappushpop(self.profiles, entry)
+
+    # Call func as callback `name`, timing it and sizing its JSON response
+    def call(self, name, func, args, kwargs):
+        profile = None
+        if self.profile_rate and random.random() < self.profile_rate and self._profile_lock.acquire(blocking=False):
+            profile = cProfile.Profile()
+        token = _current.set(name)
+        outcome = 'ok'
+        response = None
+        start = time.perf_counter()
+        try:
+            if profile is not None:
+                profile.enable()
+            response = func(*args, **kwargs)
+            return response
+        except PreventUpdate:
+            outcome = 'prevented'
+            raise
+        except Exception:
+            outcome = 'error'
+            raise
+        finally:
+            if profile is not None:
+                profile.disable()
+                self._profile_lock.release()
+            seconds = time.perf_counter() - start
+            _current.reset(token)
+            # Dash hands back the serialised response as a str
+            response_bytes = len(response) if isinstance(response, (str, bytes)) else None
+            self.record(name, seconds, response_bytes, request.content_length, outcome)
+            if profile is not None and outcome == 'ok':
+                self.keep_profile(name, seconds, profile)
+
+    def prometheus(self):
+        with self._lock:
+            callbacks = sorted(self.callbacks.items())
+            families = [
+                ('dash_callback_duration_seconds', 'histogram', "Callback latency in seconds",
+                 lambda stats, labels: stats.latency.lines('dash_callback_duration_seconds', labels)),
+                ('dash_callback_response_bytes', 'histogram', "Serialised callback response size",
+                 lambda stats, labels: stats.response_bytes.lines('dash_callback_response_bytes', labels)),
+                ('dash_callback_request_bytes', 'histogram', "Callback request (inputs and state) size",
+                 lambda stats, labels: stats.request_bytes.lines('dash_callback_request_bytes', labels)),
+                ('dash_callback_errors_total', 'counter', "Callback calls that raised",
+                 lambda stats, labels: [f'dash_callback_errors_total{{{labels}}} {stats.errors}']),
+                ('dash_callback_prevented_total', 'counter', "Callback calls that raised PreventUpdate",
+                 lambda stats, labels: [f'dash_callback_prevented_total{{{labels}}} {stats.prevented}']),
+            ]
+            lines = []
+            for family, kind, help_text, render in families:
+                lines.append(f'# HELP {family} {help_text}')
+                lines.append(f'# TYPE {family} {kind}')
+                for name, stats in callbacks:
+                    lines.extend(render(stats, f'callback="{name}"'))
+
+            observed = [(f'callback="{name}",name="{metric}"', values)
+                        for name, stats in callbacks for metric, values in sorted(stats.observed.items())]
+            lines.append('# HELP dash_callback_observed Sizes reported by callbacks (rows filtered, elements emitted)')
+            lines.append('# TYPE dash_callback_observed summary')
+            for labels, (count, total, _) in observed:
+                lines.append(f'dash_callback_observed_sum{{{labels}}} {total!r}')
+                lines.append(f'dash_callback_observed_count{{{labels}}} {count}')
+            lines.append('# HELP dash_callback_observed_max Largest size reported by callbacks')
+            lines.append('# TYPE dash_callback_observed_max gauge')
+            for labels, (_, _, largest) in observed:
+                lines.append(f'dash_callback_observed_max{{{labels}}} {largest!r}')
+        return '\n'.join(lines) + '\n'
+
+    def profile_report(self):
+        with self._lock:
+            profiles = sorted(self.profiles, reverse=True)
+        if not profiles:
+            return f"No profiles; set {PROFILE_ENV} to the share of calls to sample (e.g. 0.05)\n"
+        return '\n'.join(f"=== {name}: {seconds * 1000:.1f} ms ===\n{text}" for seconds, _, name, text in profiles)
+
+
+metrics = CallbackMetrics(profile_rate=float(os.environ.get(PROFILE_ENV) or 0))
+
+
+# Record a size for the callback that is running (e.g. rows filtered or
+# elements emitted); does nothing outside an instrumented callback
+def observe(metric, value):
+    name = _current.get()
+    if name is not None:
+        metrics.observe(name, metric, value)
+
+
+def _wrap(name, func):
+    @functools.wraps(func)
+    def instrumented(*args, **kwargs):
+        return metrics.call(name, func, args, kwargs)
+    instrumented.instrumented = True
+    return instrumented
+
+
+# Time every callback of `app`, including ones registered with dash.callback
+# (copied into the app on its first request), and serve GET /metrics
+# (Prometheus text) and GET /metrics/profiles. Background callbacks are timed
+# per request, i.e. starting the job and each progress poll; how long the job
+# itself runs is not captured, nor is anything it observe()s in its process.
+def instrument(app):
+    @app.server.before_request
+    def wrap_callbacks():
+        # Concurrent first requests would otherwise wrap a callback twice
+        with _wrap_lock:
+            for spec in list(app.callback_map.values()):
+                func = spec.get('callback')
+                if func is None or getattr(func, 'instrumented', False):
+                    continue
+                spec['callback'] = _wrap(f"{func.__module__}.{func.__name__}", func)
+
+    def metrics_route():
+        return Response(metrics.prometheus(), content_type=PROMETHEUS_MIMETYPE)
+
+    def profiles_route():
+        return Response(metrics.profile_report(), mimetype='text/plain')
+
+    app.server.add_url_rule('/metrics', 'metrics', metrics_route)
+    app.server.add_url_rule('/metrics/profiles', 'metrics_profiles', profiles_route)
+    return app
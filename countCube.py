@@ -0,0 +1,92 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from filterIndex import codes_for_spec, normalise_filter_value
+
+# Dimensions of the summary cube
+CUBE_COLUMNS = ['risk_factor', 'recovery_time', 'business_name', 'status']
+
+
+# AIT counts for every combination of the cube columns. Summary boxes sum a
+# slice of the cube (O(cells)) instead of filtering the DataFrame (O(rows)),
+# and single rows can change value without rebuilding anything.
+class CountCube:
+    def __init__(self, dataframe, columns=CUBE_COLUMNS):
+        self.columns = [column for column in columns if column in dataframe.columns]
+        self.categories = {}
+        codes = []
+        for column in self.columns:
+            column_codes, categories = pd.factorize(dataframe[column], sort=True)
+            self.categories[column] = pd.Index(categories)
+            codes.append(column_codes.astype(np.int32))
+
+        # Per-row cell coordinates, kept so row updates know which cell to leave
+        self.codes = np.stack(codes, axis=1) if codes else np.empty((len(dataframe), 0), dtype=np.int32)
+        shape = tuple(len(self.categories[column]) for column in self.columns)
+        flat = np.ravel_multi_index(tuple(self.codes.T), shape) if len(dataframe) else np.empty(0, dtype=np.int64)
+        self.counts = np.bincount(flat, minlength=int(np.prod(shape))).reshape(shape)
+
+        # Bumped on every change so callers can key caches on it
+        self.revision = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.codes)
+
+    # Index along each axis selected by column=value filters (all values if unfiltered)
+    def _axes(self, filters):
+        axes = []
+        for column in self.columns:
+            spec = normalise_filter_value(filters.get(column))
+            if spec is None:
+                axes.append(np.arange(len(self.categories[column])))
+            else:
+                axes.append(codes_for_spec(self.categories[column], spec))
+        return axes
+
+    # Number of AITs matching the filters
+    def count(self, **filters):
+        return int(self.counts[np.ix_(*self._axes(filters))].sum())
+
+    # Matching AITs per value of one column, e.g. counts_by('status', risk_factor=3)
+    def counts_by(self, column, **filters):
+        axis = self.columns.index(column)
+        other_axes = tuple(i for i in range(len(self.columns)) if i != axis)
+        totals = self.counts[np.ix_(*self._axes(filters))].sum(axis=other_axes)
+        values = self.categories[column][self._axes(filters)[axis]]
+        return dict(zip(values.tolist(), totals.tolist()))
+
+    # Same as counts_by, restricted to the given row positions (used for filters
+    # the cube does not cover, like a single AIT name)
+    def counts_by_rows(self, column, positions, **filters):
+        codes = self.codes[positions]
+        keep = np.ones(len(codes), dtype=bool)
+        for axis, selected in enumerate(self._axes(filters)):
+            keep &= np.isin(codes[:, axis], selected)
+        axis = self.columns.index(column)
+        totals = np.bincount(codes[keep, axis], minlength=len(self.categories[column]))
+        return dict(zip(self.categories[column].tolist(), totals.tolist()))
+
+    # Change one column of one row, moving it to its new cell. Values the cube
+    # has not seen yet grow that axis by one slot.
+    def set_value(self, position, column, value):
+        with self._lock:
+            axis = self.columns.index(column)
+            categories = self.categories[column]
+            code = categories.get_indexer([value])[0]
+            if code < 0:
+                self.categories[column] = categories.append(pd.Index([value]))
+                code = len(categories)
+                pad = [(0, 0)] * self.counts.ndim
+                pad[axis] = (0, 1)
+                self.counts = np.pad(self.counts, pad)
+
+            old_cell = tuple(self.codes[position])
+            if old_cell[axis] == code:
+                return
+            self.counts[old_cell] -= 1
+            self.codes[position, axis] = code
+            self.counts[tuple(self.codes[position])] += 1
+            self.revision += 1
@@ -1,52 +1,20 @@
 import dash
 from dash import dcc, html, Input, Output
 import dash_cytoscape as cyto
-import pandas as pd
+import numpy as np
 
-# Sample DataFrame with multiple upstream and downstream connections
-data = {
-    'ait_name': ['AIT1', 'AIT2', 'AIT3', 'AIT4'],
-    'id': ['1', '2', '3', '4'],
-    'upstream': [['2', '3'], ['3'], ['1'], []],       # Multiple upstream connections
-    'downstream': [['2'], ['1', '3'], ['1'], ['2']],  # Multiple downstream connections
-    'risk_factor': [3, 2, 5, 4],
-    'recovery_time': ['tier 1', 'tier 2', 'tier 3', 'tier 1'],
-    'business_name': ['Business A', 'Business B', 'Business A', 'Business C'],
-    'status': ['online', 'offline', 'online', 'offline']  # New 'status' column
-}
-df = pd.DataFrame(data)
+from callbackMetrics import instrument
+from entityStore import get_store
+from graphElements import generate_elements
+from graphLayout import layout_positions
 
-# Function to generate Cytoscape elements with different classes for filtered and connected nodes
-def generate_elements(dataframe, filtered_ids, connected_ids):
-    elements = []
-    valid_ids = set(dataframe['id'])
-
-    # Add nodes with different colors based on filtered, connected status, and online/offline
-    for _, row in dataframe.iterrows():
-        node_class = (
-            'filtered' if row['id'] in filtered_ids else
-            'connected' if row['id'] in connected_ids else
-            'default'
-        )
-        status_class = 'online' if row['status'] == 'online' else 'offline'
-        elements.append({
-            'data': {'id': row['id'], 'label': row['ait_name']},
-            'classes': f"{node_class} {status_class}"
-        })
-    
-    # Add edges for upstream and downstream connections
-    for _, row in dataframe.iterrows():
-        for upstream_id in row['upstream']:
-            if upstream_id in valid_ids:
-                elements.append({'data': {'source': upstream_id, 'target': row['id']}})
-        for downstream_id in row['downstream']:
-            if downstream_id in valid_ids:
-                elements.append({'data': {'source': row['id'], 'target': downstream_id}})
-    
-    return elements
+# AIT inventory from the shared entity store (the sample data by default)
+STORE_NAME = 'ait'
+store = get_store(STORE_NAME)
 
 # Initialize Dash app
 app = dash.Dash(__name__)
+instrument(app)
 
 app.layout = html.Div([
     html.H1("AIT Network Graph"),
@@ -58,7 +26,7 @@ app.layout = html.Div([
                 html.Span("AIT Name:"),
                 dcc.Dropdown(
                     id='ait-name-filter',
-                    options=[{'label': ait_name, 'value': ait_name} for ait_name in df['ait_name'].unique()],
+                    options=[{'label': ait_name, 'value': ait_name} for ait_name in store.frame['ait_name'].unique()],
                     placeholder="Enter AIT name",
                     multi=False,
                     searchable=True,
@@ -69,19 +37,19 @@ app.layout = html.Div([
                 html.Span("Risk Factor:"),
                 dcc.Dropdown(id='risk-filter', options=[
                     {'label': 'All', 'value': 'all'}
-                ] + [{'label': f'Risk {i}', 'value': i} for i in sorted(df['risk_factor'].unique())],
+                ] + [{'label': f'Risk {i}', 'value': i} for i in sorted(store.frame['risk_factor'].unique())],
                 placeholder="Select risk factor", multi=False, value='all'),
                 
                 html.Br(), html.Span("Recovery Time:"),
                 dcc.Dropdown(id='recovery-filter', options=[
                     {'label': 'All', 'value': 'all'}
-                ] + [{'label': tier, 'value': tier} for tier in sorted(df['recovery_time'].unique())],
+                ] + [{'label': tier, 'value': tier} for tier in sorted(store.frame['recovery_time'].unique())],
                 placeholder="Select recovery time", multi=False, value='all'),
                 
                 html.Br(), html.Span("Business Name:"),
                 dcc.Dropdown(id='business-filter', options=[
                     {'label': 'All', 'value': 'all'}
-                ] + [{'label': name, 'value': name} for name in sorted(df['business_name'].unique())],
+                ] + [{'label': name, 'value': name} for name in sorted(store.frame['business_name'].unique())],
                 placeholder="Select business name", multi=False, value='all'),
             ]),
             
@@ -91,9 +59,10 @@ app.layout = html.Div([
                 children=[
                     cyto.Cytoscape(
                         id='cytoscape',
-                        elements=generate_elements(df, set(), set()),
+                        elements=generate_elements(store.graph, np.arange(len(store)),
+                                                   layout=layout_positions(store.graph, STORE_NAME, store.version)),
                         style={'width': '100%', 'height': '500px', 'position': 'relative'},
-                        layout={'name': 'cose'},
+                        layout={'name': 'preset'},  # positions are computed server-side
                         stylesheet=[
                             {'selector': '.filtered.online', 'style': {'background-color': 'blue', 'label': 'data(label)'}},
                             {'selector': '.filtered.offline', 'style': {'background-color': 'purple', 'label': 'data(label)'}},
@@ -135,8 +104,10 @@ def store_selected_node_data(node_data):
 )
 def display_node_details(selected_id):
     if selected_id:
-        # Find the row corresponding to the selected node ID
-        node_info = df[df['id'] == selected_id].iloc[0]
+        # Hash lookup of the selected node ID in the entity store
+        node_info = get_store(STORE_NAME).get(selected_id)
+        if node_info is None:
+            return html.P("Click on a node to see details.")
         
         # Display relevant details about the selected node
         details = [
@@ -145,8 +116,8 @@ def display_node_details(selected_id):
             html.P(f"Recovery Time: {node_info['recovery_time']}"),
             html.P(f"Business Name: {node_info['business_name']}"),
             html.P(f"Status: {node_info['status']}"),
-            html.P(f"Upstream: {', '.join(node_info['upstream'])}"),
-            html.P(f"Downstream: {', '.join(node_info['downstream'])}")
+            html.P(f"Upstream: {', '.join(map(str, node_info['upstream']))}"),
+            html.P(f"Downstream: {', '.join(map(str, node_info['downstream']))}")
         ]
         return details
     return html.P("Click on a node to see details.")
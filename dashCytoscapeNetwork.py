@@ -1,54 +1,25 @@
 import dash
-from dash import dcc, html, Input, Output
+from dash import dcc, html, Input, Output, State
+from flask import jsonify
 import dash_cytoscape as cyto
-import pandas as pd
-import random
-
-
-def generate_ait_data(num_ait):
-    # Initialize lists to store each column's data
-    ait_names = [f"AIT{i+1}" for i in range(num_ait)]
-    ids = list(range(1, num_ait + 1))
-    upstream_list = []
-    downstream_list = []
-    risk_factors = [random.randint(1, 5) for _ in range(num_ait)]
-    recovery_times = [f"tier {random.randint(1, 6)}" for _ in range(num_ait)]
-    business_names = [f"Business {chr(65 + i)}" for i in range(num_ait)]
-
-    # Generate upstream and downstream connections ensuring no overlaps
-    for i in range(num_ait):
-        available_nodes = list(set(ids) - {ids[i]})  # Exclude the current node to avoid self-loop
-        if available_nodes:
-            upstream = random.sample(available_nodes, min(3, len(available_nodes)))
-        else:
-            upstream = []
-        
-        # Ensure downstream does not have common elements with upstream
-        remaining_nodes = list(set(available_nodes) - set(upstream))
-        if remaining_nodes:
-            downstream = random.sample(remaining_nodes, min(3, len(remaining_nodes)))
-        else:
-            downstream = []
-        
-        upstream_list.append(upstream)
-        downstream_list.append(downstream)
-    
-    # Create a DataFrame
-    data = {
-        "ait_name": ait_names,
-        "id": ids,
-        "upstream": upstream_list,
-        "downstream": downstream_list,
-        "risk_factor": risk_factors,
-        "recovery_time": recovery_times,
-        "business_name": business_names
-    }
-    
-    df = pd.DataFrame(data)
-    return df
-
-# Example usage
-df = generate_ait_data(1000)
+import numpy as np
+
+from aitGenerator import generate_ait_data
+from backgroundJobs import job_manager, shared_result
+from callbackMetrics import instrument, observe
+from entityStore import get_store, load_store, register_loader
+from filterIndex import bitset_positions, normalise_filter_value
+from graphAggregation import cached_aggregate, generate_group_elements
+from graphElements import generate_elements
+from graphLayout import layout_positions
+from graphPatch import patch_response
+from graphTraversal import k_hop
+from resultCache import ResultCache, cached_callback
+
+
+# Example usage: a synthetic inventory shared through the entity store
+STORE_NAME = 'ait-synthetic'
+register_loader(STORE_NAME, lambda: generate_ait_data(1000))
 
 
 # Sample DataFrame with multiple upstream and downstream connections
@@ -63,122 +34,292 @@ df = generate_ait_data(1000)
 # }
 # df = pd.DataFrame(data)
 
-# Function to generate Cytoscape elements with different classes for filtered and connected nodes
-def generate_elements(dataframe, filtered_ids, connected_ids):
-    elements = []
-    valid_ids = set(dataframe['id'])
-
-    # Add nodes with different colors based on filtered or connected status
-    for _, row in dataframe.iterrows():
-        node_class = 'filtered' if row['id'] in filtered_ids else 'connected' if row['id'] in connected_ids else 'default'
-        elements.append({'data': {'id': row['id'], 'label': row['ait_name']}, 'classes': node_class})
-    
-    # Add edges for upstream and downstream connections
-    for _, row in dataframe.iterrows():
-        for upstream_id in row['upstream']:
-            if upstream_id in valid_ids:
-                elements.append({'data': {'source': upstream_id, 'target': row['id']}})
-        for downstream_id in row['downstream']:
-            if downstream_id in valid_ids:
-                elements.append({'data': {'source': row['id'], 'target': downstream_id}})
-    
-    return elements
+# Callback results keyed on the normalised filters and the store's data version
+result_cache = ResultCache(max_bytes=64 * 1024 * 1024)
 
-# Initialize Dash app
-app = dash.Dash(__name__)
+# Element list each client currently holds, keyed by its view token
+view_cache = ResultCache(max_bytes=16 * 1024 * 1024)
+
+# Record the elements a graph job emitted once its result reaches the web
+# process: observe() inside the job's own process goes nowhere
+def observe_graph_job(result):
+    elements = result[0] if isinstance(result, (list, tuple)) else None
+    if isinstance(elements, list):
+        observe('elements_emitted', len(elements))
+
+# Runs graph updates and exports in local subprocesses (None: in the request
+# thread). Finished results are reused per filters and data version.
+background_manager = job_manager(cache_by=[lambda: get_store(STORE_NAME).data_version])
+graph_job_manager = job_manager(cache_by=[lambda: get_store(STORE_NAME).data_version], on_result=observe_graph_job)
+
+# Swap in a new AIT DataFrame; the new store version invalidates the caches
+def load_dataset(dataframe):
+    load_store(STORE_NAME, dataframe)
 
-app.layout = html.Div([
-    html.H1("AIT Network Graph"),
-    html.Div(
-        style={'display': 'flex', 'flexDirection': 'row', 'alignItems': 'flex-start'},  # Flexbox for side-by-side layout
-        children=[
-            # Left column for filters
-            html.Div(style={'flex': '1', 'padding': '10px'}, children=[
-                dcc.Dropdown(id='risk-filter', options=[
-                    {'label': 'All', 'value': 'all'}
-                ] + [{'label': f'Risk {i}', 'value': i} for i in sorted(df['risk_factor'].unique())],
-                placeholder="Select risk factor", multi=False, value='all'),
+# Layout built on first use, so importing the module (e.g. as a page of the
+# app shell) does not generate or index the AIT data
+def layout():
+    store = get_store(STORE_NAME)
+    return html.Div([
+        html.H1("AIT Network Graph"),
+        html.Div(
+            style={'display': 'flex', 'flexDirection': 'row', 'alignItems': 'flex-start'},  # Flexbox for side-by-side layout
+            children=[
+                # Left column for filters
+                html.Div(style={'flex': '1', 'padding': '10px'}, children=[
+                    dcc.Dropdown(id='risk-filter', options=[
+                        {'label': 'All', 'value': 'all'}
+                    ] + [{'label': f'Risk {i}', 'value': i} for i in sorted(store.frame['risk_factor'].unique())],
+                    placeholder="Select risk factor", multi=False, value='all'),
                 
-                dcc.Dropdown(id='recovery-filter', options=[
-                    {'label': 'All', 'value': 'all'}
-                ] + [{'label': tier, 'value': tier} for tier in sorted(df['recovery_time'].unique())],
-                placeholder="Select recovery time", multi=False, value='all'),
+                    dcc.Dropdown(id='recovery-filter', options=[
+                        {'label': 'All', 'value': 'all'}
+                    ] + [{'label': tier, 'value': tier} for tier in sorted(store.frame['recovery_time'].unique())],
+                    placeholder="Select recovery time", multi=False, value='all'),
                 
-                dcc.Dropdown(id='business-filter', options=[
-                    {'label': 'All', 'value': 'all'}
-                ] + [{'label': name, 'value': name} for name in sorted(df['business_name'].unique())],
-                placeholder="Select business name", multi=False, value='all'),
-            ]),
+                    dcc.Dropdown(id='business-filter', options=[
+                        {'label': 'All', 'value': 'all'}
+                    ] + [{'label': name, 'value': name} for name in sorted(store.frame['business_name'].unique())],
+                    placeholder="Select business name", multi=False, value='all'),
+
+                    # Blast radius: how far to expand from the filtered AITs
+                    html.Br(), html.Span("Hops:"),
+                    dcc.Slider(id='hop-depth', min=1, max=6, step=1, value=1,
+                               marks={i: str(i) for i in range(1, 7)}),
+                    dcc.RadioItems(id='hop-direction', options=[
+                        {'label': 'Both', 'value': 'both'},
+                        {'label': 'Upstream', 'value': 'upstream'},
+                        {'label': 'Downstream', 'value': 'downstream'}
+                    ], value='both', inline=True),
+
+                    # Level of detail: collapse AITs into groups above the node budget
+                    html.Br(), html.Span("Group by:"),
+                    dcc.Dropdown(id='group-by', options=[
+                        {'label': 'Business Name', 'value': 'business_name'},
+                        {'label': 'Recovery Time', 'value': 'recovery_time'}
+                    ], value='business_name', clearable=False),
+                    html.Span("Node budget:"),
+                    dcc.Input(id='node-budget', type='number', min=1, step=1, value=500, debounce=True),
+
+                    # Progress of the running graph job, cancelling it and exporting the blast radius
+                    html.Br(),
+                    html.Progress(id='graph-progress', value='0', max='1', style={'width': '100%'}),
+                    html.Span(id='graph-status'),
+                    html.Br(),
+                    html.Button("Cancel", id='cancel-graph-job'),
+                    html.Button("Export CSV", id='export-graph'),
+                    dcc.Download(id='graph-download'),
+                ]),
             
-            # Right column for Cytoscape graph
-            html.Div(
-                style={'flex': '2', 'padding': '10px'},  # More space for the graph
-                children=[
-                    cyto.Cytoscape(
-                        id='cytoscape',
-                        elements=generate_elements(df, set(), set()),
-                        style={'width': '100%', 'height': '100vh', 'position': 'relative'},
-                        layout={'name': 'cose'},
-                        # useWebGL=True,        
-                        stylesheet=[
-                            {'selector': '.filtered', 'style': {'background-color': 'green', 'label': 'data(label)'}},
-                            {'selector': '.connected', 'style': {'background-color': 'gray', 'label': 'data(label)'}},
-                            {'selector': '.default', 'style': {'background-color': 'gray', 'label': 'data(label)'}},
-                            {
-                                'selector': 'node',
-                                'style': {
-                                    'width': 5,               # Reduce node size
-                                    'height': 5,
+                # Right column for Cytoscape graph
+                html.Div(
+                    style={'flex': '2', 'padding': '10px'},  # More space for the graph
+                    children=[
+                        cyto.Cytoscape(
+                            id='cytoscape',
+                            # Filled by update_graph, which runs when the page loads
+                            elements=[],
+                            style={'width': '100%', 'height': '100vh', 'position': 'relative'},
+                            layout={'name': 'preset'},  # positions are computed server-side
+                            # useWebGL=True,        
+                            stylesheet=[
+                                {'selector': '.filtered', 'style': {'background-color': 'green', 'label': 'data(label)'}},
+                                {'selector': '.connected', 'style': {'background-color': 'gray', 'label': 'data(label)'}},
+                                {'selector': '.default', 'style': {'background-color': 'gray', 'label': 'data(label)'}},
+                                {'selector': '.group', 'style': {
+                                    'background-color': 'steelblue',
                                     'label': 'data(label)',
-                                    'font-size': '6px'         # Smaller font sizes for labels
-                                }
-                            },
-                            {
-                                'selector': 'edge',
-                                'style': {
-                                    'width': 1,                # Thinner edge lines
-                                    'line-color': '#ccc'
+                                    'width': 'mapData(size, 1, 1000, 10, 60)',
+                                    'height': 'mapData(size, 1, 1000, 10, 60)'
+                                }},
+                                {'selector': '.group.expanded', 'style': {'background-opacity': 0.1}},
+                                {'selector': '.group-edge', 'style': {'width': 'mapData(weight, 1, 100, 1, 8)'}},
+                                {
+                                    'selector': 'node',
+                                    'style': {
+                                        'width': 5,               # Reduce node size
+                                        'height': 5,
+                                        'label': 'data(label)',
+                                        'font-size': '6px'         # Smaller font sizes for labels
+                                    }
+                                },
+                                {
+                                    'selector': 'edge',
+                                    'style': {
+                                        'width': 1,                # Thinner edge lines
+                                        'line-color': '#ccc'
+                                    }
                                 }
-                            }
-                        ]
-                    )
-                ]
-            )
-        ]
-    )
-])
-
-# Callback to update graph based on filters
-@app.callback(
-    Output('cytoscape', 'elements'),
-    [Input('risk-filter', 'value'),
-     Input('recovery-filter', 'value'),
-     Input('business-filter', 'value')]
+                            ]
+                        )
+                    ]
+                )
+            ]
+        ),
+
+        # Group currently drilled into, as "<column>:<group code>"
+        dcc.Store(id='drill-group'),
+
+        # Token of the element list this client holds, used to send patches
+        dcc.Store(id='elements-view')
+    ])
+
+# Initialize Dash app
+app = dash.Dash(__name__)
+instrument(app)
+app.layout = layout
+
+# Callback to drill into a group supernode on click (click the expanded group again to collapse it)
+@dash.callback(
+    Output('drill-group', 'data'),
+    Input('cytoscape', 'tapNodeData'),
+    State('group-by', 'value')
 )
-def update_graph(risk, recovery, business):
-    # Start with the full dataset
-    filtered_data = df.copy()
-    
-    # Apply filters one by one to ensure AND condition
-    if risk != 'all':
-        filtered_data = filtered_data[filtered_data['risk_factor'] == risk]
-    if recovery != 'all':
-        filtered_data = filtered_data[filtered_data['recovery_time'] == recovery]
-    if business != 'all':
-        filtered_data = filtered_data[filtered_data['business_name'] == business]
-
-    # Collect all connected nodes (upstream and downstream)
-    filtered_ids = set(filtered_data['id'])
-    connected_ids = set()
-    for _, row in filtered_data.iterrows():
-        connected_ids.update(row['upstream'])
-        connected_ids.update(row['downstream'])
-    
-    # Filter the original DataFrame to include all nodes in connected_ids
-    connected_data = df[df['id'].isin(connected_ids)]
-    
-    # Generate elements for Cytoscape based on connected data
-    return generate_elements(connected_data, filtered_ids, connected_ids)
+def drill_into_group(node_data, group_by):
+    if not node_data or 'group_code' not in node_data:
+        return dash.no_update
+    if node_data.get('expanded'):
+        return None
+    return f"{group_by}:{node_data['group_code']}"
+
+# Filtered AIT positions and the hop distance of every AIT from them
+def expand_filters(risk, recovery, business, depth=1, direction='both'):
+    store = get_store(STORE_NAME)
+
+    # Intersect the per-value bitsets (AND condition across filters)
+    filtered_bits = store.filters.select(risk_factor=risk, recovery_time=recovery, business_name=business)
+
+    # Collect everything within `depth` hops of the filtered nodes
+    filtered_positions = bitset_positions(filtered_bits, len(store.graph))
+    return filtered_positions, k_hop(store.graph, filtered_positions, depth or 1, direction or 'both')
+
+# Elements for the current filters; progress(done, total) is called after
+# every step (expansion, layout, elements)
+def build_graph_elements(risk, recovery, business, depth=1, direction='both', group_by='business_name',
+                         node_budget=None, drill_group=None, progress=None):
+    progress = progress or (lambda done, total: None)
+    store = get_store(STORE_NAME)
+    graph_index = store.graph
+    filter_index = store.filters
+
+    filtered_positions, distance = expand_filters(risk, recovery, business, depth, direction)
+    visible_positions = np.flatnonzero(distance >= 0)
+    connected_positions = np.flatnonzero(distance > 0)
+    progress(1, 3)
+    layout = layout_positions(graph_index, STORE_NAME, store.version)
+    progress(2, 3)
+
+    # Too many nodes to draw one by one: collapse them into group supernodes
+    if node_budget and len(visible_positions) > node_budget:
+        group_by = group_by or 'business_name'
+        column = filter_index.columns[group_by]
+        aggregate = None
+        if len(visible_positions) == len(graph_index):
+            aggregate = cached_aggregate(STORE_NAME, store.data_version, group_by, graph_index,
+                                         column['codes'], len(column['categories']))
+        drill_code = None
+        if drill_group and drill_group.startswith(group_by + ':'):
+            drill_code = int(drill_group.split(':', 1)[1])
+        elements = generate_group_elements(graph_index, column['codes'], column['categories'], visible_positions,
+                                           filtered_positions, connected_positions, layout=layout,
+                                           drill_code=drill_code, aggregate=aggregate)
+    else:
+        # Generate elements for Cytoscape for the filtered and connected nodes
+        elements = generate_elements(graph_index, visible_positions, filtered_positions, connected_positions,
+                                     layout=layout)
+    progress(3, 3)
+    return elements
+
+# Elements for the current filters, cached per filter combination
+@cached_callback(result_cache, lambda: get_store(STORE_NAME).data_version)
+def graph_elements(risk, recovery, business, depth=1, direction='both', group_by='business_name', node_budget=None,
+                   drill_group=None):
+    return build_graph_elements(risk, recovery, business, depth, direction, group_by, node_budget, drill_group)
+
+GRAPH_INPUTS = [
+    Input('risk-filter', 'value'),
+    Input('recovery-filter', 'value'),
+    Input('business-filter', 'value'),
+    Input('hop-depth', 'value'),
+    Input('hop-direction', 'value'),
+    Input('group-by', 'value'),
+    Input('node-budget', 'value'),
+    Input('drill-group', 'data')
+]
+
+# Update graph based on filters, patching only what changed since the
+# client's previous element list
+def update_graph(risk, recovery, business, depth, direction, group_by, node_budget, drill_group, view_token):
+    elements = graph_elements(risk, recovery, business, depth, direction, group_by, node_budget, drill_group)
+    observe('elements_emitted', len(elements))
+    return patch_response(view_cache, get_store(STORE_NAME).data_version, view_token, elements)
+
+# Same update as a background job: it reports progress, a newer filter change
+# (or Cancel) terminates it, and identical jobs running at the same time share
+# one computation. Its process does not see view_cache, so it sends full lists.
+def update_graph_job(set_progress, risk, recovery, business, depth, direction, group_by, node_budget, drill_group,
+                     view_token):
+    args = (risk, recovery, business, depth, direction, group_by, node_budget, drill_group)
+    key = repr((STORE_NAME, get_store(STORE_NAME).data_version) + tuple(normalise_filter_value(arg) for arg in args))
+    elements = shared_result('graph_elements:' + key, lambda: build_graph_elements(
+        *args, progress=lambda done, total: set_progress((done, total))))
+    return elements, None
+
+if background_manager is None:
+    update_graph = dash.callback(
+        Output('cytoscape', 'elements'),
+        Output('elements-view', 'data'),
+        GRAPH_INPUTS,
+        State('elements-view', 'data')
+    )(update_graph)
+else:
+    # Dash wires up the Cancel buttons of background callbacks (and validates
+    # them) when the app serves its first request, so this module must be
+    # imported before then: the app shell imports every page up front.
+    update_graph_job = dash.callback(
+        Output('cytoscape', 'elements'),
+        Output('elements-view', 'data'),
+        GRAPH_INPUTS,
+        State('elements-view', 'data'),
+        background=True,
+        manager=graph_job_manager,
+        progress=[Output('graph-progress', 'value'), Output('graph-progress', 'max')],
+        running=[(Output('graph-status', 'children'), "Updating graph...", "")],
+        cancel=[Input('cancel-graph-job', 'n_clicks')],
+        cache_args_to_ignore=[8]  # the view token differs per client
+    )(update_graph_job)
+
+# Visible AITs with their hop distance from the filtered ones, as CSV
+def export_graph(n_clicks, risk, recovery, business, depth, direction):
+    if not n_clicks:
+        return dash.no_update
+    _, distance = expand_filters(risk, recovery, business, depth, direction)
+    visible_positions = np.flatnonzero(distance >= 0)
+    frame = get_store(STORE_NAME).frame.iloc[visible_positions].copy()
+    frame['hops'] = distance[visible_positions]
+    return dcc.send_data_frame(frame.to_csv, 'ait-blast-radius.csv', index=False)
+
+export_graph = dash.callback(
+    Output('graph-download', 'data'),
+    Input('export-graph', 'n_clicks'),
+    [State('risk-filter', 'value'),
+     State('recovery-filter', 'value'),
+     State('business-filter', 'value'),
+     State('hop-depth', 'value'),
+     State('hop-direction', 'value')],
+    prevent_initial_call=True,
+    **({} if background_manager is None else dict(
+        background=True,
+        manager=background_manager,
+        running=[(Output('export-graph', 'disabled'), True, False)],
+        cancel=[Input('cancel-graph-job', 'n_clicks')]
+    ))
+)(export_graph)
+
+# Hit / miss / eviction counters of the result and view caches
+@app.server.route('/cache-stats')
+def cache_stats():
+    return jsonify({'results': result_cache.stats(), 'views': view_cache.stats()})
 
 if __name__ == '__main__':
     app.run_server(debug=True)
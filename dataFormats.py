@@ -0,0 +1,197 @@
+import gzip
+import io
+import json
+import urllib.parse
+import urllib.request
+import zlib
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # Arrow responses are not offered without pyarrow
+    pa = None
+
+try:
+    import zstandard
+except ImportError:  # zstd is only offered when zstandard is installed
+    zstandard = None
+
+ARROW_MIMETYPE = 'application/vnd.apache.arrow.stream'
+COLUMNS_MIMETYPE = 'application/vnd.columns+json'
+JSON_MIMETYPE = 'application/json'
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+# ?format= names and their media types, in server preference order for Accept
+FORMATS = {
+    'json': JSON_MIMETYPE,
+    'ndjson': NDJSON_MIMETYPE,
+    'columns': COLUMNS_MIMETYPE,
+    'arrow': ARROW_MIMETYPE,
+}
+
+# Bodies smaller than this are not worth compressing
+COMPRESS_MIN_BYTES = 8 * 1024
+
+
+def available_formats():
+    return [name for name in FORMATS if name != 'arrow' or pa is not None]
+
+
+def available_encodings():
+    return (['zstd'] if zstandard is not None else []) + ['gzip']
+
+
+# Column-oriented JSON: the column names once, then every batch as one list
+# per column:  {"columns": ["id", "name"], "batches": [[[1, 2], ["a", "b"]], ...]}
+def columns_json_chunks(batches, dumps=json.dumps):
+    first = True
+    for columns, rows in batches:
+        if first:
+            yield '{"columns":' + dumps(columns) + ',"batches":['
+        body = dumps([list(values) for values in zip(*rows)] if rows else [[] for _ in columns])
+        yield body if first else ',' + body
+        first = False
+    yield '{"columns":[],"batches":[]}' if first else ']}'
+
+
+# Arrow type of a column declared in SQLite, by its type affinity rules; None
+# when the declaration does not pin the values down (no type, BLOB, DATE, ...)
+def sqlite_arrow_type(declared):
+    declared = (declared or '').upper()
+    if 'INT' in declared:
+        return pa.int64()
+    if any(name in declared for name in ('CHAR', 'CLOB', 'TEXT')):
+        return pa.string()
+    if any(name in declared for name in ('REAL', 'FLOA', 'DOUB')):
+        return pa.float64()
+    # NUMERIC affinity keeps whole numbers as integers and the rest as reals
+    if declared.startswith(('NUMERIC', 'DECIMAL')):
+        return pa.float64()
+    return None
+
+
+_SQL_SERVER_TYPES = {
+    'bit': 'bool',
+    'tinyint': 'int64', 'smallint': 'int64', 'int': 'int64', 'bigint': 'int64',
+    'real': 'float64', 'float': 'float64',
+    'date': 'date32',
+    'char': 'string', 'varchar': 'string', 'nchar': 'string', 'nvarchar': 'string', 'text': 'string',
+    'ntext': 'string',
+    'binary': 'binary', 'varbinary': 'binary', 'image': 'binary',
+}
+
+
+# Arrow type of a SQL Server column from INFORMATION_SCHEMA.COLUMNS, or None
+def sql_server_arrow_type(data_type, precision=None, scale=None):
+    data_type = data_type.lower()
+    if data_type in ('decimal', 'numeric'):
+        return pa.decimal128(precision, scale)
+    if data_type == 'money':
+        return pa.decimal128(19, 4)
+    if data_type == 'smallmoney':
+        return pa.decimal128(10, 4)
+    if data_type in ('datetime', 'datetime2', 'smalldatetime'):
+        return pa.timestamp('us')
+    name = _SQL_SERVER_TYPES.get(data_type)
+    return getattr(pa, name)() if name else None
+
+
+# Arrow IPC stream: one record batch per cursor batch. The schema is fixed by
+# the first batch: `types` (column name -> Arrow type, e.g. from the declared
+# column types) where known, else the type seen in that batch (strings for
+# all-NULL columns). Later batches are cast to it safely, so a value that does
+# not fit (2998.5 in an integer column) raises instead of being truncated.
+def arrow_stream_chunks(batches, types=None):
+    types = types or {}
+    sink = io.BytesIO()
+    writer = None
+    schema = None
+    for columns, rows in batches:
+        values = list(zip(*rows)) if rows else [() for _ in columns]
+        arrays = [pa.array(column) for column in values]
+        if schema is None:
+            schema = pa.schema([
+                pa.field(name, types.get(name) or (pa.string() if pa.types.is_null(array.type) else array.type))
+                for name, array in zip(columns, arrays)
+            ])
+            writer = pa.ipc.new_stream(sink, schema)
+        arrays = [array if array.type == field.type else array.cast(field.type, safe=True)
+                  for array, field in zip(arrays, schema)]
+        writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+        yield sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+    if writer is None:
+        writer = pa.ipc.new_stream(sink, pa.schema([]))
+    writer.close()
+    yield sink.getvalue()
+
+
+# Compress a stream of str/bytes chunks as they are produced
+def compress_chunks(chunks, encoding):
+    if encoding == 'zstd':
+        compressor = zstandard.ZstdCompressor().compressobj()
+        flush_mode = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+    else:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+        flush_mode = zlib.Z_SYNC_FLUSH
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+        # Flush per chunk so the client can start decoding early
+        yield data + compressor.flush(flush_mode)
+    yield compressor.flush()
+
+
+def compress(body, encoding):
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor().compress(body)
+    # mtime=0: the same body always compresses to the same bytes (and ETag)
+    return gzip.compress(body, compresslevel=6, mtime=0)
+
+
+def decompress(body, encoding):
+    if encoding == 'zstd':
+        return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    if encoding == 'gzip':
+        return gzip.decompress(body)
+    return body
+
+
+# DataFrame from a /data response body, without building a dict per row for
+# the Arrow and column formats
+def frame_from_body(body, content_type, content_encoding=None):
+    body = decompress(body, content_encoding)
+    content_type = (content_type or JSON_MIMETYPE).split(';')[0].strip()
+    if content_type == ARROW_MIMETYPE:
+        return pa.ipc.open_stream(body).read_pandas()
+    if content_type == COLUMNS_MIMETYPE:
+        payload = json.loads(body)
+        columns = payload['columns']
+        data = {name: [] for name in columns}
+        for batch in payload['batches']:
+            for name, values in zip(columns, batch):
+                data[name].extend(values)
+        return pd.DataFrame(data, columns=columns)
+    if content_type == NDJSON_MIMETYPE:
+        return pd.read_json(io.BytesIO(body), lines=True) if body.strip() else pd.DataFrame()
+    return pd.DataFrame(json.loads(body))
+
+
+# Fetch /data into a DataFrame, e.g. as an entity store loader:
+#   register_loader('ait', lambda: load_frame('http://host:5000/data'))
+def load_frame(url, columns=None, after=None, limit=None, data_format=None, timeout=60):
+    data_format = data_format or ('arrow' if pa is not None else 'columns')
+    params = {key: value for key, value in
+              {'columns': ','.join(columns) if columns else None, 'after': after, 'limit': limit}.items()
+              if value is not None}
+    if params:
+        url += ('&' if '?' in url else '?') + urllib.parse.urlencode(params)
+    request = urllib.request.Request(url, headers={
+        'Accept': FORMATS[data_format],
+        'Accept-Encoding': ', '.join(available_encodings()),
+    })
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return frame_from_body(response.read(), response.headers.get('Content-Type'),
+                               response.headers.get('Content-Encoding'))
@@ -0,0 +1,179 @@
+import contextlib
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(RuntimeError):
+    pass
+
+
+# Bounded pool of DB-API connections. `connect` is any zero-argument callable
+# returning a connection (pymssql, sqlite3, pyodbc, ...). Connections that sat
+# idle longer than check_interval are pinged with health_query before reuse,
+# and connections that raised while checked out are discarded, not reused.
+class ConnectionPool:
+    def __init__(self, connect, max_size=8, timeout=5.0, health_query='SELECT 1', check_interval=30.0,
+                 max_lifetime=3600.0):
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_query = health_query
+        self.check_interval = check_interval
+        self.max_lifetime = max_lifetime
+
+        # Idle connections as (connection, created, last_used), most recent last
+        self._idle = deque()
+        self._size = 0
+        self._condition = threading.Condition()
+        self.created = 0
+        self.reused = 0
+        self.discarded = 0
+        self.waits = 0
+
+    def _healthy(self, connection):
+        try:
+            cursor = connection.cursor()
+            cursor.execute(self.health_query)
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, connection):
+        with contextlib.suppress(Exception):
+            connection.close()
+        with self._condition:
+            self._size -= 1
+            self.discarded += 1
+            self._condition.notify()
+
+    # Check out a connection as (connection, created); waits up to `timeout`
+    # seconds when all max_size connections are in use
+    def acquire(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._condition:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(f"No database connection free after {self.timeout}s")
+                    self.waits += 1
+                    self._condition.wait(remaining)
+                if self._idle:
+                    connection, created, last_used = self._idle.pop()
+                else:
+                    # Reserve the slot, connect outside the lock
+                    self._size += 1
+                    connection = None
+
+            if connection is None:
+                try:
+                    connection = self.connect()
+                except BaseException:
+                    with self._condition:
+                        self._size -= 1
+                        self._condition.notify()
+                    raise
+                with self._condition:
+                    self.created += 1
+                return connection, time.monotonic()
+
+            now = time.monotonic()
+            if now - created > self.max_lifetime:
+                self._discard(connection)
+                continue
+            if now - last_used > self.check_interval and not self._healthy(connection):
+                self._discard(connection)
+                continue
+            with self._condition:
+                self.reused += 1
+            return connection, created
+
+    # Return a connection; broken ones are closed instead of going back idle
+    def release(self, connection, created, broken=False):
+        if not broken:
+            try:
+                # End the read transaction so the next user sees fresh data
+                connection.rollback()
+            except Exception:
+                broken = True
+        if broken:
+            self._discard(connection)
+            return
+        with self._condition:
+            self._idle.append((connection, created, time.monotonic()))
+            self._condition.notify()
+
+    @contextlib.contextmanager
+    def connection(self):
+        connection, created = self.acquire()
+        try:
+            yield connection
+        except BaseException:
+            self.release(connection, created, broken=True)
+            raise
+        else:
+            self.release(connection, created)
+
+    def close(self):
+        with self._condition:
+            idle, self._idle = list(self._idle), deque()
+        for connection, _, _ in idle:
+            self._discard(connection)
+
+    def stats(self):
+        with self._condition:
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'max_size': self.max_size,
+                'created': self.created,
+                'reused': self.reused,
+                'discarded': self.discarded,
+                'waits': self.waits,
+            }
+
+
+# Coalesces concurrent calls with the same key: the first caller runs the
+# function, everyone arriving while it runs waits for and shares its result
+# (or its exception).
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = {'done': threading.Event(), 'result': None, 'error': None}
+                leader = True
+                self.executions += 1
+            else:
+                leader = False
+                self.coalesced += 1
+
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = func()
+            return call['result']
+        except BaseException as error:
+            call['error'] = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+
+    def stats(self):
+        with self._lock:
+            return {'in_flight': len(self._calls), 'executions': self.executions, 'coalesced': self.coalesced}
@@ -0,0 +1,243 @@
+import itertools
+import threading
+
+import numpy as np
+import pandas as pd
+
+from countCube import CountCube
+from filterIndex import FilterIndex
+from graphIndex import build_graph_index, gather_neighbours
+
+# Columns stored as pandas categoricals (few distinct values, many rows)
+CATEGORICAL_COLUMNS = ['recovery_time', 'business_name', 'status']
+
+# Python list columns that are replaced by the CSR graph index
+LIST_COLUMNS = ['upstream', 'downstream']
+
+# Sample AIT inventory used by the network demo apps
+SAMPLE_AIT_DATA = {
+    'ait_name': ['AIT1', 'AIT2', 'AIT3', 'AIT4'],
+    'id': ['1', '2', '3', '4'],
+    'upstream': [['2', '3'], ['3'], ['1'], []],       # Multiple upstream connections
+    'downstream': [['2'], ['1', '3'], ['1'], ['2']],  # Multiple downstream connections
+    'risk_factor': [3, 2, 5, 4],
+    'recovery_time': ['tier 1', 'tier 2', 'tier 3', 'tier 1'],
+    'business_name': ['Business A', 'Business B', 'Business A', 'Business C'],
+    'status': ['online', 'offline', 'online', 'offline']
+}
+
+# Every store gets a new version number, so caches keyed on it invalidate on reload
+_versions = itertools.count(1)
+
+_stores = {}
+_loaders = {'ait': lambda: pd.DataFrame(SAMPLE_AIT_DATA)}
+_lock = threading.RLock()
+
+
+# Integer ids as int32 when every id is a plain integer (also for '1', '2', ...)
+def _compact_ids(series):
+    if pd.api.types.is_integer_dtype(series):
+        if len(series) and series.abs().max() < 2**31:
+            return series.to_numpy(dtype=np.int32), False
+        return series.to_numpy(), False
+    try:
+        as_int = pd.to_numeric(series, errors='raise').astype(np.int64)
+    except (TypeError, ValueError):
+        return series.to_numpy(), False
+    if not (as_int.astype(str).to_numpy() == series.astype(str).to_numpy()).all():
+        return series.to_numpy(), False
+    if len(as_int) and as_int.abs().max() < 2**31:
+        return as_int.to_numpy(dtype=np.int32), series.dtype != as_int.dtype
+    return as_int.to_numpy(), series.dtype != as_int.dtype
+
+
+# Columnar, typed copy of an entity table (AITs, scatter points, cities, ...)
+# with hash indexes from id and label to row position. AIT stores also own the
+# CSR graph index and, lazily, the filter index and count cube built on it.
+class EntityStore:
+    def __init__(self, frame, graph=None, id_column='id', label_column='ait_name', string_ids=False, version=None):
+        self.frame = frame
+        self.graph = graph
+        self.id_column = id_column
+        self.label_column = label_column
+        self.string_ids = string_ids
+        self.version = next(_versions) if version is None else version
+        # Bumped by every set_value, so caches of derived values can key on it
+        self.revision = 0
+
+        if graph is not None:
+            self._id_index = graph.position
+        elif id_column:
+            self._id_index = pd.Index(frame[id_column])
+        else:
+            self._id_index = None
+        self._label_index = None
+
+        self._filters = None
+        self._cube = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_dataframe(cls, dataframe, id_column='id', label_column='ait_name'):
+        columns = {}
+        string_ids = False
+        for column in dataframe.columns:
+            if column in LIST_COLUMNS:
+                continue
+            series = dataframe[column]
+            if column == id_column:
+                values, string_ids = _compact_ids(series)
+                columns[column] = values
+            elif column in CATEGORICAL_COLUMNS:
+                columns[column] = series.astype('category')
+            elif pd.api.types.is_integer_dtype(series):
+                columns[column] = pd.to_numeric(series, downcast='integer')
+            else:
+                columns[column] = series
+        frame = pd.DataFrame(columns)
+
+        graph = None
+        if id_column and all(column in dataframe.columns for column in LIST_COLUMNS):
+            graph = build_graph_index(
+                dataframe,
+                ids=frame[id_column].to_numpy(),
+                labels=frame[label_column].to_numpy() if label_column else frame[id_column].to_numpy(),
+                status=frame['status'].array if 'status' in frame.columns else None,
+            )
+        return cls(frame, graph, id_column, label_column, string_ids)
+
+    def __len__(self):
+        return len(self.frame)
+
+    # Row position of an id or None; '3' and 3 find the same AIT
+    def position_of(self, entity_id):
+        if self._id_index is None:
+            return None
+        if self._id_index.dtype.kind in 'iu':
+            try:
+                entity_id = int(entity_id)
+            except (TypeError, ValueError):
+                return None
+        try:
+            return int(self._id_index.get_loc(entity_id))
+        except KeyError:
+            return None
+
+    def position_of_label(self, label):
+        if self.label_column is None:
+            return None
+        with self._lock:
+            if self._label_index is None:
+                # Built on first lookup, so loading a store stays cheap
+                self._label_index = pd.Index(self.frame[self.label_column].astype(object))
+        try:
+            return int(self._label_index.get_loc(label))
+        except KeyError:
+            return None
+
+    # Ids in the form the source data used (strings stay strings)
+    def external_ids(self, positions):
+        ids = self.frame[self.id_column].to_numpy()[positions].tolist()
+        return [str(i) for i in ids] if self.string_ids else ids
+
+    # One row as a plain dict, with upstream/downstream ids rebuilt from the CSR arrays
+    def row(self, position):
+        record = {column: self.frame[column].iat[position] for column in self.frame.columns}
+        record = {k: (v.item() if isinstance(v, np.generic) else v) for k, v in record.items()}
+        if self.id_column and self.string_ids:
+            record[self.id_column] = str(record[self.id_column])
+        if self.graph is not None:
+            record['upstream'] = self.external_ids(
+                gather_neighbours(self.graph.up_offsets, self.graph.up_neighbours, [position]))
+            record['downstream'] = self.external_ids(
+                gather_neighbours(self.graph.down_offsets, self.graph.down_neighbours, [position]))
+        return record
+
+    def get(self, entity_id):
+        position = self.position_of(entity_id)
+        return None if position is None else self.row(position)
+
+    def get_by_label(self, label):
+        position = self.position_of_label(label)
+        return None if position is None else self.row(position)
+
+    # Changes when the store is reloaded and whenever a value is edited
+    @property
+    def data_version(self):
+        return self.version, self.revision
+
+    # Filter bitsets, built on first use
+    @property
+    def filters(self):
+        with self._lock:
+            if self._filters is None:
+                self._filters = FilterIndex(self.frame)
+            return self._filters
+
+    # Summary count cube, built on first use
+    @property
+    def cube(self):
+        with self._lock:
+            if self._cube is None:
+                self._cube = CountCube(self.frame)
+            return self._cube
+
+    # Change one attribute of one row in place (e.g. an AIT going offline)
+    def set_value(self, position, column, value):
+        series = self.frame[column]
+        if isinstance(series.dtype, pd.CategoricalDtype) and value not in series.cat.categories:
+            self.frame[column] = series.cat.add_categories([value])
+        self.frame.iat[position, self.frame.columns.get_loc(column)] = value
+        if self.graph is not None and column == 'status':
+            self.graph.status = self.frame['status'].array
+        if self._cube is not None and column in self._cube.columns:
+            self._cube.set_value(position, column, value)
+        with self._lock:
+            # Rebuilt from the edited frame on next use
+            self._filters = None
+            if column == self.label_column:
+                self._label_index = None
+            self.revision += 1
+
+    # Bytes held by the typed columns and the graph arrays
+    def memory_usage(self):
+        total = int(self.frame.memory_usage(deep=True).sum())
+        if self.graph is not None:
+            total += sum(value.nbytes for value in vars(self.graph).values() if isinstance(value, np.ndarray))
+        return total
+
+
+# Register how to build a named store; it is only built on first get_store()
+def register_loader(name, loader):
+    with _lock:
+        _loaders[name] = loader
+
+
+# Build a store from a DataFrame and make it the current one under `name`
+def load_store(name, dataframe, **kwargs):
+    store = EntityStore.from_dataframe(dataframe, **kwargs)
+    with _lock:
+        _stores[name] = store
+    return store
+
+
+# Names of the stores built so far
+def loaded_stores():
+    with _lock:
+        return list(_stores)
+
+
+# Current store for `name`, building it from its registered loader if needed.
+# A loader may return a DataFrame or (DataFrame, from_dataframe kwargs).
+def get_store(name):
+    with _lock:
+        store = _stores.get(name)
+        if store is None:
+            loaded = _loaders[name]()
+            if isinstance(loaded, EntityStore):
+                store = _stores[name] = loaded
+            elif isinstance(loaded, tuple):
+                store = load_store(name, loaded[0], **loaded[1])
+            else:
+                store = load_store(name, loaded)
+        return store
@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+
+# Columns the dashboards filter on
+FILTER_COLUMNS = ['risk_factor', 'recovery_time', 'business_name', 'status', 'ait_name']
+
+# Number of set bits in every possible byte, used to count packed bitsets
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.int64)
+
+
+# Turn a dropdown value into a canonical filter spec:
+#   None / 'all' / []          -> None (no filter)
+#   {'min': 3, 'max': 5}       -> ('range', 3, 5)
+#   [3, 4] (multi-select)      -> ('in', (3, 4))
+#   3                          -> ('in', (3,))
+def normalise_filter_value(value):
+    if value is None or (isinstance(value, str) and value == 'all'):
+        return None
+    if isinstance(value, dict):
+        return ('range', value.get('min'), value.get('max'))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        values = [v for v in value if not (isinstance(v, str) and v == 'all')]
+        if not values or len(values) < len(value):
+            # An explicit 'All' in a multi-select means no filter
+            return None
+        return ('in', tuple(sorted(set(values), key=repr)))
+    return ('in', (value,))
+
+
+# Codes (positions in the sorted categories) matching a normalised filter spec
+def codes_for_spec(categories, spec):
+    if spec[0] == 'range':
+        _, low, high = spec
+        # Plain values: unordered categoricals refuse < and >
+        values = pd.Index(np.asarray(categories))
+        keep = np.ones(len(categories), dtype=bool)
+        if low is not None:
+            keep &= np.asarray(values >= low)
+        if high is not None:
+            keep &= np.asarray(values <= high)
+        return np.flatnonzero(keep)
+    codes = categories.get_indexer(pd.Index(list(spec[1])))
+    return codes[codes >= 0]
+
+
+# Number of rows set in a packed bitset
+def bitset_count(bits):
+    return int(_POPCOUNT[bits].sum())
+
+
+# Row positions set in a packed bitset
+def bitset_positions(bits, num_rows):
+    return np.flatnonzero(np.unpackbits(bits, count=num_rows)).astype(np.int32)
+
+
+# Packed bitset with the given row positions set
+def bitset_from_positions(positions, num_rows):
+    mask = np.zeros(num_rows, dtype=bool)
+    mask[positions] = True
+    return np.packbits(mask)
+
+
+# Per-value inverted index over the filter columns. Every value owns one packed
+# bitset (1 bit per AIT), so a filter is a union of value bitsets per column and
+# an intersection across columns, independent of how the DataFrame is laid out.
+class FilterIndex:
+    def __init__(self, dataframe, columns=FILTER_COLUMNS, max_bitset_values=64):
+        self.num_rows = len(dataframe)
+        self.max_bitset_values = max_bitset_values
+        self.all_rows = np.packbits(np.ones(self.num_rows, dtype=bool))
+        self.columns = {}
+
+        for column in columns:
+            if column not in dataframe.columns:
+                continue
+            codes, categories = pd.factorize(dataframe[column], sort=True)
+            codes = codes.astype(np.int32)
+
+            # Postings list (row positions grouped by value) for every value
+            order = np.argsort(codes, kind='stable').astype(np.int32)
+            offsets = np.zeros(len(categories) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(codes, minlength=len(categories)), out=offsets[1:])
+
+            # Low-cardinality columns get all their bitsets up front, the rest
+            # (ait_name, large business lists) are built from postings on demand
+            bitsets = {}
+            if len(categories) <= max_bitset_values:
+                for code in range(len(categories)):
+                    bitsets[code] = np.packbits(codes == code)
+
+            self.columns[column] = {
+                'categories': pd.Index(categories),
+                'codes': codes,
+                'order': order,
+                'offsets': offsets,
+                'bitsets': bitsets,
+            }
+
+    def values(self, column):
+        return self.columns[column]['categories'].tolist()
+
+    # Bitset of a single value code, building and memoising it if needed
+    def _code_bitset(self, column, code):
+        entry = self.columns[column]
+        bits = entry['bitsets'].get(code)
+        if bits is None:
+            positions = entry['order'][entry['offsets'][code]:entry['offsets'][code + 1]]
+            bits = bitset_from_positions(positions, self.num_rows)
+            if len(entry['bitsets']) < self.max_bitset_values:
+                entry['bitsets'][code] = bits
+        return bits
+
+    # Row positions holding the given value(s), straight from the postings lists
+    def positions(self, column, value):
+        spec = normalise_filter_value(value)
+        entry = self.columns[column]
+        if spec is None:
+            return np.arange(self.num_rows, dtype=np.int32)
+        codes = codes_for_spec(entry['categories'], spec)
+        return np.sort(np.concatenate(
+            [entry['order'][entry['offsets'][code]:entry['offsets'][code + 1]] for code in codes]
+            + [np.empty(0, dtype=np.int32)]
+        ))
+
+    # Bitset for one column filter (union over its values); None means no filter
+    def bitset(self, column, value):
+        spec = normalise_filter_value(value)
+        if spec is None:
+            return None
+        codes = codes_for_spec(self.columns[column]['categories'], spec)
+        if len(codes) == 0:
+            return np.zeros_like(self.all_rows)
+        bits = self._code_bitset(column, codes[0]).copy()
+        for code in codes[1:]:
+            bits |= self._code_bitset(column, code)
+        return bits
+
+    # AND together the filters given as column=value keyword arguments
+    def select(self, **filters):
+        result = None
+        for column, value in filters.items():
+            bits = self.bitset(column, value)
+            if bits is None:
+                continue
+            if result is None:
+                result = bits
+            else:
+                result &= bits
+        return self.all_rows.copy() if result is None else result
@@ -0,0 +1,129 @@
+import threading
+
+import numpy as np
+
+from graphElements import generate_elements
+
+# Columns AITs can be collapsed by
+GROUP_COLUMNS = ['business_name', 'recovery_time']
+
+# (name, version, column) -> full-graph aggregate, computed once per dataset version
+_aggregate_cache = {}
+_aggregate_lock = threading.Lock()
+
+
+# Id of the supernode standing for one group
+def group_node_id(code):
+    return f"group:{code}"
+
+
+# Group sizes and weighted group-to-group edges. Only AITs in `visible` (a
+# boolean mask, None = all) are counted; edges inside one group are dropped.
+def aggregate_groups(index, codes, num_groups, visible=None):
+    sources, targets = index.edge_source, index.edge_target
+    if visible is not None:
+        keep = visible[sources] & visible[targets]
+        sources, targets = sources[keep], targets[keep]
+        sizes = np.bincount(codes[visible], minlength=num_groups)
+    else:
+        sizes = np.bincount(codes, minlength=num_groups)
+
+    source_groups = codes[sources].astype(np.int64)
+    target_groups = codes[targets].astype(np.int64)
+    between = source_groups != target_groups
+    keys, weights = np.unique(source_groups[between] * num_groups + target_groups[between], return_counts=True)
+
+    return {
+        'sizes': sizes,
+        'sources': keys // num_groups,
+        'targets': keys % num_groups,
+        'weights': weights,
+    }
+
+
+# Full-graph aggregate for one dataset version and grouping column
+def cached_aggregate(name, version, column, index, codes, num_groups):
+    key = (name, version, column)
+    with _aggregate_lock:
+        aggregate = _aggregate_cache.get(key)
+        if aggregate is None:
+            # Older versions of the same app are never asked for again
+            for old_key in [k for k in _aggregate_cache if k[0] == name and k[1] != version]:
+                del _aggregate_cache[old_key]
+            aggregate = aggregate_groups(index, codes, num_groups)
+            _aggregate_cache[key] = aggregate
+        return aggregate
+
+
+# Cytoscape elements for the collapsed view: one supernode per group with
+# visible AITs, weighted edges between groups, and optionally one group
+# (drill_code) expanded into its AITs inside a compound parent node.
+def generate_group_elements(index, codes, categories, visible_positions, filtered_positions=(),
+                            connected_positions=(), layout=None, drill_code=None, aggregate=None):
+    num_groups = len(categories)
+    visible = np.zeros(len(index), dtype=bool)
+    visible[visible_positions] = True
+    if aggregate is None:
+        aggregate = aggregate_groups(index, codes, num_groups, visible)
+
+    groups = np.flatnonzero(aggregate['sizes'] > 0)
+    elements = []
+    for code, size in zip(groups.tolist(), aggregate['sizes'][groups].tolist()):
+        expanded = code == drill_code
+        elements.append({
+            'data': {'id': group_node_id(code), 'label': f"{categories[code]} ({size})",
+                     'size': size, 'group_code': code, 'expanded': expanded},
+            'classes': 'group expanded' if expanded else 'group'
+        })
+
+    # Supernodes sit at the centre of their members' preset positions
+    if layout is not None:
+        members = np.flatnonzero(visible)
+        counts = np.maximum(np.bincount(codes[members], minlength=num_groups), 1)
+        centre_x = np.bincount(codes[members], weights=layout[members, 0], minlength=num_groups) / counts
+        centre_y = np.bincount(codes[members], weights=layout[members, 1], minlength=num_groups) / counts
+        for element, x, y in zip(elements, centre_x[groups].tolist(), centre_y[groups].tolist()):
+            if not element['data']['expanded']:
+                element['position'] = {'x': round(x, 1), 'y': round(y, 1)}
+
+    # Group-to-group edges, leaving out the group that is drilled into
+    keep = (aggregate['sources'] != drill_code) & (aggregate['targets'] != drill_code)
+    elements.extend(
+        {'data': {'source': group_node_id(source), 'target': group_node_id(target), 'weight': weight},
+         'classes': 'group-edge'}
+        for source, target, weight in zip(aggregate['sources'][keep].tolist(),
+                                          aggregate['targets'][keep].tolist(),
+                                          aggregate['weights'][keep].tolist())
+    )
+
+    if drill_code is not None and drill_code in set(groups.tolist()):
+        elements.extend(_drill_elements(index, codes, visible, drill_code, filtered_positions,
+                                        connected_positions, layout))
+    return elements
+
+
+# AIT nodes of the drilled group (children of its compound node), the edges
+# between them, and their edges to other groups collapsed per (AIT, group)
+def _drill_elements(index, codes, visible, drill_code, filtered_positions, connected_positions, layout):
+    num_groups = int(codes.max()) + 1
+    inside = visible & (codes == drill_code)
+    elements = generate_elements(index, np.flatnonzero(inside), filtered_positions, connected_positions,
+                                 layout=layout)
+    parent = group_node_id(drill_code)
+    for element in elements:
+        if 'source' not in element['data']:
+            element['data']['parent'] = parent
+
+    sources, targets = index.edge_source, index.edge_target
+    outside = visible & ~inside
+    for from_inside, member, other in ((True, sources, targets), (False, targets, sources)):
+        keep = inside[member] & outside[other]
+        keys, weights = np.unique(member[keep].astype(np.int64) * num_groups + codes[other[keep]],
+                                  return_counts=True)
+        member_ids = index.ids[keys // num_groups].tolist()
+        group_ids = [group_node_id(code) for code in (keys % num_groups).tolist()]
+        for member_id, group_id, weight in zip(member_ids, group_ids, weights.tolist()):
+            source, target = (member_id, group_id) if from_inside else (group_id, member_id)
+            elements.append({'data': {'source': source, 'target': target, 'weight': weight},
+                             'classes': 'group-edge'})
+    return elements
@@ -0,0 +1,64 @@
+import numpy as np
+
+
+# Function to generate Cytoscape elements for any subset of AITs in a GraphIndex.
+# node_positions are the row positions to draw, filtered/connected positions only
+# decide the node classes. Edges are kept when both ends are drawn; unique_edges
+# collapses parallel edges into one carrying a 'weight'. With layout (n x 2
+# array from graphLayout) every node also carries a preset position.
+def generate_elements(index, node_positions, filtered_positions=(), connected_positions=(), unique_edges=False,
+                      layout=None):
+    num_nodes = len(index)
+    node_positions = np.asarray(node_positions, dtype=np.int64)
+
+    visible = np.zeros(num_nodes, dtype=bool)
+    visible[node_positions] = True
+    is_filtered = np.zeros(num_nodes, dtype=bool)
+    is_filtered[np.asarray(filtered_positions, dtype=np.int64)] = True
+    is_connected = np.zeros(num_nodes, dtype=bool)
+    is_connected[np.asarray(connected_positions, dtype=np.int64)] = True
+
+    # Node classes: filtered wins over connected, everything else is default
+    classes = np.full(len(node_positions), 'default', dtype=object)
+    classes[is_connected[node_positions]] = 'connected'
+    classes[is_filtered[node_positions]] = 'filtered'
+    if index.status is not None:
+        status = index.status[node_positions]
+        classes = classes + np.where(status == 'online', ' online', ' offline').astype(object)
+
+    elements = [
+        {'data': {'id': node_id, 'label': label}, 'classes': node_class}
+        for node_id, label, node_class in zip(
+            index.ids[node_positions].tolist(),
+            index.labels[node_positions].tolist(),
+            classes.tolist(),
+        )
+    ]
+    if layout is not None:
+        xy = np.round(layout[node_positions].astype(np.float64), 1).tolist()
+        for element, (x, y) in zip(elements, xy):
+            element['position'] = {'x': x, 'y': y}
+
+    # Edges with both ends drawn, optionally collapsed to one per (source, target)
+    if unique_edges:
+        sources, targets, weights = index.unique_edges()
+        keep = np.flatnonzero(visible[sources] & visible[targets])
+        elements.extend(
+            {'data': {'source': source, 'target': target, 'weight': weight}}
+            for source, target, weight in zip(
+                index.ids[sources[keep]].tolist(),
+                index.ids[targets[keep]].tolist(),
+                weights[keep].tolist(),
+            )
+        )
+        return elements
+
+    keep = np.flatnonzero(visible[index.edge_source] & visible[index.edge_target])
+    elements.extend(
+        {'data': {'source': source, 'target': target}}
+        for source, target in zip(
+            index.ids[index.edge_source[keep]].tolist(),
+            index.ids[index.edge_target[keep]].tolist(),
+        )
+    )
+    return elements
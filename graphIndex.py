@@ -0,0 +1,155 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+# Every array a GraphIndex is made of, besides ids, labels and status
+GRAPH_ARRAYS = ('up_offsets', 'up_neighbours', 'down_offsets', 'down_neighbours', 'edge_source', 'edge_target',
+                'out_offsets', 'out_neighbours', 'in_offsets', 'in_neighbours')
+
+
+# Compressed sparse row (CSR) view of the AIT upstream/downstream lists.
+# Built once when the data loads so the callbacks never have to walk the
+# Python list columns again. Every AIT is addressed by its row position
+# (0..n-1) and all neighbour arrays are int32 positions.
+class GraphIndex:
+    def __init__(self, ids, labels, status, up_offsets, up_neighbours, down_offsets, down_neighbours):
+        self.ids = ids
+        self.labels = labels
+        self.status = status
+        self.position = pd.Index(ids)
+
+        # Per-column CSR: row i lists its own upstream / downstream AITs
+        self.up_offsets = up_offsets
+        self.up_neighbours = up_neighbours
+        self.down_offsets = down_offsets
+        self.down_neighbours = down_neighbours
+
+        # Directed edge list in the same order the old generate_elements emitted:
+        # upstream -> row for every upstream entry, then row -> downstream
+        up_rows = np.repeat(np.arange(len(ids), dtype=np.int32), np.diff(up_offsets))
+        down_rows = np.repeat(np.arange(len(ids), dtype=np.int32), np.diff(down_offsets))
+        self.edge_source = np.concatenate([up_neighbours, down_rows])
+        self.edge_target = np.concatenate([up_rows, down_neighbours])
+
+        # Edge-level CSR in both directions, used for traversal
+        self.out_offsets, self.out_neighbours = _csr_from_pairs(self.edge_source, self.edge_target, len(ids))
+        self.in_offsets, self.in_neighbours = _csr_from_pairs(self.edge_target, self.edge_source, len(ids))
+
+        self._unique_edges = None
+
+    # Index from arrays saved earlier (see graphSnapshot), skipping the edge
+    # list and CSR construction; unique_edges is (sources, targets, weights)
+    @classmethod
+    def from_arrays(cls, ids, labels, status, arrays, unique_edges=None):
+        index = cls.__new__(cls)
+        index.ids = ids
+        index.labels = labels
+        index.status = status
+        index.position = pd.Index(ids)
+        for name in GRAPH_ARRAYS:
+            setattr(index, name, arrays[name])
+        index._unique_edges = unique_edges
+        return index
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def num_edges(self):
+        return len(self.edge_source)
+
+    # Distinct (source, target) edges with their multiplicity as weight, in
+    # first-occurrence order. An AIT listing B as downstream while B lists it
+    # as upstream gives one edge of weight 2. Computed once per index.
+    def unique_edges(self):
+        if self._unique_edges is None:
+            keys = edge_keys(self.edge_source, self.edge_target)
+            _, first, counts = np.unique(keys, return_index=True, return_counts=True)
+            order = np.argsort(first, kind='stable')
+            first = first[order]
+            self._unique_edges = (self.edge_source[first], self.edge_target[first], counts[order].astype(np.int32))
+        return self._unique_edges
+
+    # Map a collection of AIT ids to row positions, dropping unknown ids
+    def positions_of(self, ids):
+        if isinstance(ids, (set, frozenset)):
+            ids = list(ids)
+        if len(ids) == 0:
+            return np.empty(0, dtype=np.int32)
+        positions = self.position.get_indexer(pd.Index(ids))
+        return positions[positions >= 0].astype(np.int32)
+
+    # Direct upstream and downstream AITs (from the row's own lists)
+    def list_neighbours(self, positions):
+        return np.concatenate([
+            gather_neighbours(self.up_offsets, self.up_neighbours, positions),
+            gather_neighbours(self.down_offsets, self.down_neighbours, positions),
+        ])
+
+
+# Pack directed (source, target) position pairs into one int64 key per edge
+def edge_keys(sources, targets):
+    return (sources.astype(np.int64) << 32) | targets.astype(np.int64)
+
+
+# Build CSR offsets/neighbours from parallel (row, neighbour) position arrays
+def _csr_from_pairs(rows, neighbours, num_rows):
+    order = np.argsort(rows, kind='stable')
+    counts = np.bincount(rows, minlength=num_rows)
+    offsets = np.zeros(num_rows + 1, dtype=np.int32)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets, neighbours[order].astype(np.int32)
+
+
+# Turn one list column (e.g. 'upstream') into CSR arrays of row positions
+def _list_column_to_csr(column, position):
+    num_rows = len(column)
+    lengths = np.fromiter(map(len, column), dtype=np.int64, count=num_rows)
+    flat_ids = list(itertools.chain.from_iterable(column))
+    rows = np.repeat(np.arange(num_rows, dtype=np.int32), lengths)
+
+    if flat_ids:
+        neighbours = position.get_indexer(pd.Index(flat_ids))
+    else:
+        neighbours = np.empty(0, dtype=np.int64)
+
+    # References to AITs that are not in the inventory are dropped, the same
+    # way the old generate_elements skipped ids outside valid_ids
+    known = neighbours >= 0
+    rows = rows[known]
+    neighbours = neighbours[known].astype(np.int32)
+
+    return _csr_from_pairs(rows, neighbours, num_rows)
+
+
+# Gather the CSR neighbours of all given positions in one vectorised step
+def gather_neighbours(offsets, neighbours, positions):
+    positions = np.asarray(positions, dtype=np.int64)
+    starts = offsets[positions].astype(np.int64)
+    lengths = offsets[positions + 1] - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int32)
+    # Index of every gathered neighbour = start of its row + offset within the row
+    row_starts = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return neighbours[row_starts + np.arange(total)]
+
+
+# Build the index for an AIT DataFrame with 'id', 'ait_name', 'upstream' and
+# 'downstream' columns ('status' is optional). ids/labels/status replace the
+# frame's own columns in the index (e.g. compact typed arrays from the entity
+# store); the list columns are always resolved against the frame's 'id' column.
+def build_graph_index(dataframe, ids=None, labels=None, status=None):
+    position = pd.Index(dataframe['id'])
+    if ids is None:
+        ids = dataframe['id'].to_numpy()
+    if labels is None:
+        labels = dataframe['ait_name'].to_numpy()
+    if status is None and 'status' in dataframe.columns:
+        status = dataframe['status'].to_numpy()
+
+    up_offsets, up_neighbours = _list_column_to_csr(dataframe['upstream'].tolist(), position)
+    down_offsets, down_neighbours = _list_column_to_csr(dataframe['downstream'].tolist(), position)
+
+    return GraphIndex(ids, labels, status, up_offsets, up_neighbours, down_offsets, down_neighbours)
@@ -0,0 +1,163 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Graphs up to this size use exact all-pairs repulsion, bigger ones a density grid
+EXACT_REPULSION_LIMIT = 1500
+
+# Pixels per unit of ideal edge length in the emitted Cytoscape positions
+LAYOUT_SCALE = 40.0
+
+# (name, version) -> (ids, positions); a few versions are kept per app
+_layout_cache = OrderedDict()
+_layout_lock = threading.Lock()
+MAX_CACHED_LAYOUTS = 8
+
+
+# Exact Fruchterman-Reingold repulsion (k^2 / d) for every pair, in row blocks
+def _exact_repulsion(positions, movable):
+    rows = np.flatnonzero(movable)
+    displacement = np.zeros_like(positions)
+    x = positions[:, 0].astype(np.float32)
+    y = positions[:, 1].astype(np.float32)
+    block = max(1, 4_000_000 // max(len(positions), 1))
+    for start in range(0, len(rows), block):
+        chunk = rows[start:start + block]
+        dx = x[chunk, None] - x[None, :]
+        dy = y[chunk, None] - y[None, :]
+        inv_dist_sq = 1.0 / np.maximum(dx * dx + dy * dy, 1e-4)
+        displacement[chunk, 0] = (dx * inv_dist_sq).sum(axis=1)
+        displacement[chunk, 1] = (dy * inv_dist_sq).sum(axis=1)
+    return displacement
+
+
+# Approximate repulsion: push nodes down the gradient of a node density grid
+def _grid_repulsion(positions, movable, cell_size=2.0):
+    low = positions.min(axis=0)
+    cells = np.floor((positions - low) / cell_size).astype(np.int64)
+    shape = cells.max(axis=0) + 1
+    flat = cells[:, 0] * shape[1] + cells[:, 1]
+    density = np.bincount(flat, minlength=int(shape[0] * shape[1])).reshape(shape).astype(np.float64)
+
+    grad_x, grad_y = (np.gradient(density) if min(shape) > 1 else (np.zeros(shape), np.zeros(shape)))
+    displacement = np.zeros_like(positions)
+    displacement[:, 0] = -grad_x[cells[:, 0], cells[:, 1]]
+    displacement[:, 1] = -grad_y[cells[:, 0], cells[:, 1]]
+    displacement[~movable] = 0.0
+    return displacement * cell_size
+
+
+# One force-directed step over the whole edge list; only movable rows move
+def _step(positions, sources, targets, movable, temperature, exact):
+    num_nodes = len(positions)
+    if exact:
+        displacement = _exact_repulsion(positions, movable)
+    else:
+        displacement = _grid_repulsion(positions, movable)
+
+    # Spring attraction (d^2 / k) along every edge, summed per node with bincount
+    delta = positions[targets] - positions[sources]
+    dist = np.sqrt((delta ** 2).sum(axis=1))[:, None]
+    pull = delta * dist
+    for axis in range(2):
+        displacement[:, axis] += np.bincount(sources, weights=pull[:, axis], minlength=num_nodes)
+        displacement[:, axis] -= np.bincount(targets, weights=pull[:, axis], minlength=num_nodes)
+
+    # Weak gravity keeps disconnected pieces from drifting away
+    displacement -= 0.01 * positions
+
+    # Cap each move at the current temperature
+    length = np.maximum(np.sqrt((displacement ** 2).sum(axis=1)), 1e-9)[:, None]
+    move = displacement / length * np.minimum(length, temperature)
+    move[~movable] = 0.0
+    positions += move
+
+
+# Run the force-directed layout. positions (n x 2, layout units) is updated in
+# place; when movable is given only those rows are relaxed.
+def force_layout(index, positions=None, movable=None, iterations=60, seed=0):
+    num_nodes = len(index)
+    rng = np.random.default_rng(seed)
+    if positions is None:
+        positions = rng.uniform(-1, 1, size=(num_nodes, 2)) * np.sqrt(max(num_nodes, 1))
+    if movable is None:
+        movable = np.ones(num_nodes, dtype=bool)
+    if num_nodes == 0 or not movable.any():
+        return positions
+
+    sources = index.edge_source.astype(np.int64)
+    targets = index.edge_target.astype(np.int64)
+    exact = num_nodes <= EXACT_REPULSION_LIMIT
+    start_temperature = np.sqrt(num_nodes) / 10 + 1.0
+
+    for i in range(iterations):
+        temperature = start_temperature * (1 - i / iterations) + 0.05
+        _step(positions, sources, targets, movable, temperature, exact)
+    return positions
+
+
+# Place new nodes at the mean of their already placed neighbours, then relax
+# only those nodes so everything that was on screen before stays put
+def relax_new_nodes(index, positions, new_mask, iterations=30, seed=0):
+    rng = np.random.default_rng(seed)
+    placed = ~new_mask
+    sources = index.edge_source.astype(np.int64)
+    targets = index.edge_target.astype(np.int64)
+
+    sums = np.zeros_like(positions)
+    counts = np.zeros(len(positions))
+    for here, there in ((sources, targets), (targets, sources)):
+        keep = new_mask[here] & placed[there]
+        for axis in range(2):
+            sums[:, axis] += np.bincount(here[keep], weights=positions[there[keep], axis], minlength=len(positions))
+        counts += np.bincount(here[keep], minlength=len(positions))
+
+    has_anchor = new_mask & (counts > 0)
+    positions[has_anchor] = sums[has_anchor] / counts[has_anchor, None]
+    positions[new_mask] += rng.normal(scale=0.5, size=(int(new_mask.sum()), 2))
+    return force_layout(index, positions, movable=new_mask, iterations=iterations, seed=seed)
+
+
+# Positions (n x 2, Cytoscape pixels) for a dataset version, computed once and
+# cached. A newer version of the same app reuses the positions of every AIT it
+# already knew and only relaxes the new ones.
+def layout_positions(index, name, version):
+    key = (name, version)
+    with _layout_lock:
+        cached = _layout_cache.get(key)
+        if cached is not None:
+            _layout_cache.move_to_end(key)
+            return cached[1]
+
+        previous = None
+        for (cached_name, _), entry in reversed(_layout_cache.items()):
+            if cached_name == name:
+                previous = entry
+                break
+
+        if previous is None:
+            positions = force_layout(index)
+        else:
+            old_ids, old_positions = previous
+            found = old_ids.get_indexer(index.position)
+            new_mask = found < 0
+            positions = np.zeros((len(index), 2))
+            positions[~new_mask] = old_positions[found[~new_mask]] / LAYOUT_SCALE
+            positions = relax_new_nodes(index, positions, new_mask)
+
+        positions = (positions * LAYOUT_SCALE).astype(np.float32)
+        _layout_cache[key] = (pd.Index(index.ids), positions)
+        while len(_layout_cache) > MAX_CACHED_LAYOUTS:
+            _layout_cache.popitem(last=False)
+        return positions
+
+
+# Make precomputed positions (e.g. from a graph snapshot) the cached layout of
+# a dataset version
+def seed_layout(name, version, ids, positions):
+    with _layout_lock:
+        _layout_cache[(name, version)] = (pd.Index(ids), positions)
+        while len(_layout_cache) > MAX_CACHED_LAYOUTS:
+            _layout_cache.popitem(last=False)
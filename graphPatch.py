@@ -0,0 +1,89 @@
+import uuid
+
+from dash import Patch
+
+# Send the full element list instead of a patch when the patch would touch more
+# than this share of the new list
+MAX_PATCH_RATIO = 0.5
+
+
+# Stable identity of an element: node id, or source/target plus the occurrence
+# number for parallel edges
+def element_keys(elements):
+    keys = []
+    seen = {}
+    for element in elements:
+        data = element['data']
+        if 'source' in data:
+            key = ('e', data['source'], data['target'])
+            seen[key] = seen.get(key, -1) + 1
+            keys.append(key + (seen[key],))
+        else:
+            keys.append(('n', data['id']))
+    return keys
+
+
+# Diff the list the client holds against the new one. Returns the Patch and the
+# element list the client will hold once the patch is applied, or (None, None)
+# when a full re-send is cheaper.
+def diff_elements(old_elements, new_elements):
+    old_keys = element_keys(old_elements)
+    new_keys = element_keys(new_elements)
+    new_by_key = dict(zip(new_keys, new_elements))
+    old_key_set = set(old_keys)
+
+    patch = Patch()
+    operations = 0
+
+    # Deletions from the back so the earlier indexes stay valid
+    removed = [i for i, key in enumerate(old_keys) if key not in new_by_key]
+    for i in reversed(removed):
+        del patch[i]
+    operations += len(removed)
+
+    # Surviving elements keep their order; only rewrite what changed
+    client_elements = []
+    for key, old in zip(old_keys, old_elements):
+        new = new_by_key.get(key)
+        if new is None:
+            continue
+        position = len(client_elements)
+        client_elements.append(new)
+        if new is old or new == old:
+            continue
+        if {k: v for k, v in new.items() if k != 'classes'} == {k: v for k, v in old.items() if k != 'classes'}:
+            patch[position]['classes'] = new.get('classes', '')
+        else:
+            patch[position] = new
+        operations += 1
+
+    added = [element for key, element in zip(new_keys, new_elements) if key not in old_key_set]
+    if added:
+        patch.extend(added)
+        operations += len(added)
+    client_elements.extend(added)
+
+    if operations > MAX_PATCH_RATIO * max(len(new_elements), 1):
+        return None, None
+    return patch, client_elements
+
+
+# Callback helper: remember what each client holds (under a view token kept in a
+# dcc.Store) and answer with a Patch when we know the client's previous list.
+# Returns (elements or Patch, new view token).
+def patch_response(view_cache, version, token, new_elements):
+    old_elements = view_cache.get(token, version) if token else None
+    client_elements = None
+    response = new_elements
+    if old_elements is not None:
+        patch, client_elements = diff_elements(old_elements, new_elements)
+        if patch is not None:
+            response = patch
+
+    if client_elements is None:
+        client_elements = new_elements
+    new_token = uuid.uuid4().hex
+    # Counted at full size: the element dicts may outlive (or never enter) the
+    # result cache, and then only this entry keeps them alive
+    view_cache.put(new_token, version, client_elements)
+    return response, new_token
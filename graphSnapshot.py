@@ -0,0 +1,250 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from aitIngest import ingest
+from entityStore import EntityStore
+from graphIndex import GRAPH_ARRAYS, GraphIndex
+from graphLayout import layout_positions, seed_layout
+
+try:
+    import pyarrow as pa
+except ImportError:  # string columns are decoded in Python without pyarrow
+    pa = None
+
+# Bumped whenever the file layout changes; older snapshots are rebuilt
+SNAPSHOT_FORMAT = 1
+MANIFEST_NAME = 'manifest.json'
+
+# Snapshot directories kept per snapshot root, newest first
+KEEP_SNAPSHOTS = 2
+
+logger = logging.getLogger(__name__)
+
+
+# Checksum of the source inventory; a snapshot is valid for exactly one
+def source_checksum(path, block_size=1 << 20):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def snapshot_path(snapshot_dir, checksum):
+    return os.path.join(snapshot_dir, checksum)
+
+
+# Strings as one UTF-8 byte array plus int64 offsets (Arrow large_string layout)
+def _encode_strings(values):
+    encoded = [str(value).encode() for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+    return offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+
+# String column over the (memory-mapped) buffers; with pyarrow no string is
+# decoded until it is used
+def _decode_strings(offsets, data):
+    if pa is not None:
+        array = pa.LargeStringArray.from_buffers(len(offsets) - 1, pa.py_buffer(offsets), pa.py_buffer(data))
+        return pd.Series(array, dtype='str').array
+    text = data.tobytes()
+    return np.array([text[start:end].decode() for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())],
+                    dtype=object)
+
+
+class _SnapshotWriter:
+    def __init__(self, directory):
+        self.directory = directory
+        self.arrays = {}
+
+    def add(self, key, values):
+        filename = key + '.npy'
+        np.save(os.path.join(self.directory, filename), np.ascontiguousarray(values))
+        self.arrays[key] = filename
+
+    def add_strings(self, key, values):
+        offsets, data = _encode_strings(values)
+        self.add(key + '.offsets', offsets)
+        self.add(key + '.data', data)
+
+    # One frame column: numbers as they are, categoricals as codes plus their
+    # categories, strings as UTF-8 buffers
+    def add_column(self, position, series):
+        key = f'column{position}'
+        spec = {'name': series.name, 'key': key}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            spec['kind'] = 'categorical'
+            self.add(key + '.codes', series.cat.codes.to_numpy())
+            categories = series.cat.categories
+            spec['string_categories'] = not pd.api.types.is_numeric_dtype(categories.dtype)
+            if spec['string_categories']:
+                self.add_strings(key + '.categories', categories)
+            else:
+                self.add(key + '.categories', categories.to_numpy())
+        elif pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_bool_dtype(series.dtype):
+            spec['kind'] = 'numeric'
+            self.add(key, series.to_numpy())
+        elif pd.api.types.is_string_dtype(series.dtype) and not series.isna().any():
+            spec['kind'] = 'string'
+            self.add_strings(key, series.to_numpy())
+        else:
+            raise ValueError(f"Column {series.name!r} ({series.dtype}) cannot be stored in a graph snapshot")
+        return spec
+
+
+# Write the prepared store (typed columns, CSR graph, unique edges and layout
+# positions) as <snapshot_dir>/<checksum>/ of .npy files plus a manifest.
+# The directory appears atomically, so readers never see half a snapshot.
+def write_snapshot(store, snapshot_dir, checksum, name='ait'):
+    final_path = snapshot_path(snapshot_dir, checksum)
+    tmp_path = f"{final_path}.tmp-{os.getpid()}"
+    os.makedirs(tmp_path, exist_ok=True)
+    try:
+        writer = _SnapshotWriter(tmp_path)
+        columns = [writer.add_column(position, store.frame[column])
+                   for position, column in enumerate(store.frame.columns)]
+
+        graph = store.graph
+        if graph is not None:
+            for array_name in GRAPH_ARRAYS:
+                writer.add('graph.' + array_name, getattr(graph, array_name))
+            sources, targets, weights = graph.unique_edges()
+            writer.add('graph.unique_source', sources)
+            writer.add('graph.unique_target', targets)
+            writer.add('graph.unique_weight', weights)
+            writer.add('layout.positions', layout_positions(graph, name, store.version))
+
+        manifest = {
+            'format': SNAPSHOT_FORMAT,
+            'source_checksum': checksum,
+            'created': time.time(),
+            'rows': len(store),
+            'edges': graph.num_edges if graph is not None else 0,
+            'id_column': store.id_column,
+            'label_column': store.label_column,
+            'string_ids': store.string_ids,
+            'columns': columns,
+            'arrays': writer.arrays,
+        }
+        # The manifest goes last: a directory without one is incomplete
+        with open(os.path.join(tmp_path, MANIFEST_NAME), 'w') as f:
+            json.dump(manifest, f)
+
+        try:
+            os.rename(tmp_path, final_path)
+        except OSError:
+            # Another process finished the same snapshot first
+            if not os.path.exists(os.path.join(final_path, MANIFEST_NAME)):
+                raise
+            shutil.rmtree(tmp_path, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+    _remove_old_snapshots(snapshot_dir, keep=checksum)
+    return final_path
+
+
+def _remove_old_snapshots(snapshot_dir, keep):
+    snapshots = []
+    for entry in os.scandir(snapshot_dir):
+        if entry.is_dir() and entry.name != keep and os.path.exists(os.path.join(entry.path, MANIFEST_NAME)):
+            snapshots.append((entry.stat().st_mtime, entry.path))
+    # Processes still mapping a removed snapshot keep their pages until they exit
+    for _, path in sorted(snapshots, reverse=True)[KEEP_SNAPSHOTS - 1:]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+# EntityStore over a snapshot directory, or None if there is no complete
+# snapshot of this format (and checksum, if given). Graph arrays are mapped
+# read-only; frame columns copy-on-write, so set_value changes stay private
+# to the process. Positions become the cached layout under `name`.
+def load_snapshot(path, checksum=None, name='ait'):
+    try:
+        with open(os.path.join(path, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return None
+    if manifest.get('format') != SNAPSHOT_FORMAT:
+        return None
+    if checksum is not None and manifest['source_checksum'] != checksum:
+        return None
+
+    def array(key, mmap_mode='r'):
+        return np.load(os.path.join(path, manifest['arrays'][key]), mmap_mode=mmap_mode)
+
+    def strings(key):
+        return _decode_strings(array(key + '.offsets'), array(key + '.data'))
+
+    columns = {}
+    for spec in manifest['columns']:
+        key = spec['key']
+        if spec['kind'] == 'categorical':
+            categories = strings(key + '.categories') if spec['string_categories'] else array(key + '.categories')
+            columns[spec['name']] = pd.Categorical.from_codes(array(key + '.codes', 'c'), categories=categories)
+        elif spec['kind'] == 'string':
+            columns[spec['name']] = strings(key)
+        else:
+            columns[spec['name']] = array(key, 'c')
+    frame = pd.DataFrame(columns, copy=False)
+
+    id_column = manifest['id_column']
+    label_column = manifest['label_column']
+    graph = None
+    if 'graph.' + GRAPH_ARRAYS[0] in manifest['arrays']:
+        graph = GraphIndex.from_arrays(
+            ids=frame[id_column].to_numpy() if id_column else None,
+            labels=frame[label_column or id_column].array,
+            status=frame['status'].array if 'status' in frame.columns else None,
+            arrays={array_name: array('graph.' + array_name) for array_name in GRAPH_ARRAYS},
+            unique_edges=(array('graph.unique_source'), array('graph.unique_target'), array('graph.unique_weight')),
+        )
+    store = EntityStore(frame, graph, id_column, label_column, manifest['string_ids'])
+    if graph is not None:
+        seed_layout(name, store.version, graph.ids, array('layout.positions'))
+    return store
+
+
+# Entity store loader (see register_loader) for an inventory export: opens the
+# snapshot matching the export's checksum, or ingests the export, prepares
+# the store and writes the snapshot for the next process.
+#   register_loader('ait', snapshot_loader('inventory.xlsx', 'snapshots', 'ait'))
+def snapshot_loader(source_path, snapshot_dir, name='ait', **ingest_kwargs):
+    def load():
+        start = time.perf_counter()
+        checksum = source_checksum(source_path)
+        store = load_snapshot(snapshot_path(snapshot_dir, checksum), checksum, name)
+        if store is not None:
+            logger.info("Opened graph snapshot %s for %s (%d rows) in %.3fs",
+                        checksum, source_path, len(store), time.perf_counter() - start)
+            return store
+
+        dataframe, _ = ingest(source_path, **ingest_kwargs)
+        store = EntityStore.from_dataframe(dataframe)
+        os.makedirs(snapshot_dir, exist_ok=True)
+        write_snapshot(store, snapshot_dir, checksum, name)
+        logger.info("Built graph snapshot %s for %s (%d rows) in %.2fs",
+                    checksum, source_path, len(store), time.perf_counter() - start)
+        return store
+    return load
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Build the memory-mapped graph snapshot of an AIT inventory")
+    parser.add_argument('path')
+    parser.add_argument('snapshot_dir')
+    parser.add_argument('--name', default='ait', help="Store name the layout is cached under")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    store = snapshot_loader(args.path, args.snapshot_dir, args.name)()
+    print(f"{len(store):,d} rows, {store.graph.num_edges if store.graph is not None else 0:,d} edges "
+          f"in {snapshot_path(args.snapshot_dir, source_checksum(args.path))}")
@@ -0,0 +1,52 @@
+import numpy as np
+
+from graphIndex import gather_neighbours
+
+DIRECTIONS = ('upstream', 'downstream', 'both')
+
+
+# Next frontier for one BFS level, following edges in the requested direction
+def _expand(index, frontier, direction):
+    parts = []
+    if direction in ('downstream', 'both'):
+        parts.append(gather_neighbours(index.out_offsets, index.out_neighbours, frontier))
+    if direction in ('upstream', 'both'):
+        parts.append(gather_neighbours(index.in_offsets, index.in_neighbours, frontier))
+    return np.concatenate(parts) if len(parts) > 1 else parts[0]
+
+
+# Frontier-at-a-time BFS from the seed positions over the edge CSR arrays.
+# Returns an int16 array with the hop distance of every AIT (-1 = not reached
+# within max_depth). 'upstream' follows edges backwards (who feeds the seeds),
+# 'downstream' follows them forwards (who depends on the seeds).
+def k_hop(index, seeds, max_depth, direction='both'):
+    if direction not in DIRECTIONS:
+        raise ValueError(f"direction must be one of {DIRECTIONS}, got {direction!r}")
+
+    num_nodes = len(index)
+    distance = np.full(num_nodes, -1, dtype=np.int16)
+    visited = np.zeros(num_nodes, dtype=bool)
+
+    frontier = np.unique(np.asarray(seeds, dtype=np.int64))
+    visited[frontier] = True
+    distance[frontier] = 0
+
+    for depth in range(1, max_depth + 1):
+        if len(frontier) == 0:
+            break
+        neighbours = _expand(index, frontier, direction)
+        neighbours = neighbours[~visited[neighbours]]
+        if len(neighbours) == 0:
+            break
+
+        # Dedup through the visited bitmap instead of sorting the frontier
+        visited[neighbours] = True
+        distance[neighbours] = depth
+        frontier = np.flatnonzero(distance == depth)
+
+    return distance
+
+
+# Row positions within max_depth hops of the seeds (seeds included)
+def blast_radius(index, seeds, max_depth, direction='both'):
+    return np.flatnonzero(k_hop(index, seeds, max_depth, direction) >= 0).astype(np.int32)
@@ -0,0 +1,16 @@
+import multiprocessing
+import os
+
+# gunicorn -c gunicorn.conf.py 'wsgi:create_app()'
+bind = os.environ.get('BIND', '0.0.0.0:8050')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.environ.get('WEB_THREADS', 4))
+worker_class = 'gthread'
+timeout = 120
+
+# Load the app (and the AIT graph) once in the master, then fork the workers
+preload_app = True
+
+# Restart workers now and then; a fresh fork shares the master's pages again
+max_requests = 5000
+max_requests_jitter = 500
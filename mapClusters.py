@@ -0,0 +1,338 @@
+import threading
+
+import numpy as np
+
+# Cell edge in degrees at level 0; every level halves it
+BASE_CELL_DEGREES = 45.0
+# Finest level considered (~0.003 degrees, a few hundred metres)
+MAX_LEVEL = 14
+# Levels whose cells hold on average fewer points than this are not stored;
+# the raw points are shown instead when zoomed that far
+MIN_POINTS_PER_CELL = 1.25
+# Grid columns across the visible longitude span when picking a level
+TARGET_COLUMNS = 48
+# Upper bound on markers sent to the browser
+MAX_CLUSTERS = 2500
+# Full-world view of the natural earth projection at projection.scale == 1
+WORLD_SPAN = (360.0, 180.0)
+# Density mode: finest grid level (~0.18 degree cells), grid columns across the
+# visible span, and the most cells sent to the browser
+DENSITY_MAX_LEVEL = 8
+DENSITY_COLUMNS = 160
+MAX_DENSITY_CELLS = 20000
+# Width of the whole world in pixels on a tile map (density mode) at zoom 0;
+# every zoom level doubles it
+MAP_TILE_PX = 512
+
+_pyramid_cache = {}
+_pyramid_lock = threading.Lock()
+_density_cache = {}
+
+
+def cell_degrees(level):
+    return BASE_CELL_DEGREES / 2 ** level
+
+
+# Spread the low 32 bits of every value to the even bit positions (Morton code)
+def _interleave(values):
+    values = values & np.uint64(0xFFFFFFFF)
+    for shift, mask in ((16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF), (4, 0x0F0F0F0F0F0F0F0F),
+                        (2, 0x3333333333333333), (1, 0x5555555555555555)):
+        values = (values | (values << np.uint64(shift))) & np.uint64(mask)
+    return values
+
+
+# Sum of every run of a sorted array, runs starting at `starts`
+def _run_sums(values, starts):
+    return np.add.reduceat(values, starts) if len(starts) else values[:0]
+
+
+# Cells of one level, sorted by (column, row) so a longitude range is a slice
+class _Level:
+    def __init__(self, column, row, count, points, lat_sum, lon_sum, first):
+        order = np.lexsort((row, column))
+        self.column = column[order].astype(np.int32)
+        self.row = row[order].astype(np.int32)
+        self.count = count[order]
+        self.points = points[order]
+        self.lat = (lat_sum[order] / points[order]).astype(np.float32)
+        self.lon = (lon_sum[order] / points[order]).astype(np.float32)
+        self.first = first[order]
+
+    def __len__(self):
+        return len(self.column)
+
+
+# Multi-resolution grid over lat/lon points. Every level stores, per non-empty
+# cell, the summed count, the number of points, their mean position and one
+# representative point (used when the cell holds a single point). Built once
+# per dataset version; a viewport query touches only the cells in view.
+class ClusterPyramid:
+    def __init__(self, lat, lon, count=None):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        count = np.ones(len(lat), dtype=np.int64) if count is None else np.asarray(count, dtype=np.int64)
+        self.num_points = len(lat)
+
+        # Raw points sorted by longitude for deep zoom
+        order = np.argsort(lon)
+        self.point_order = order.astype(np.int64)
+        self.point_lat = lat[order].astype(np.float32)
+        self.point_lon = lon[order].astype(np.float32)
+        self.point_count = count[order]
+
+        # Points sorted once along a Z-order curve of their finest cell: every
+        # coarser cell is then a contiguous run (key >> 2 per level), so all
+        # levels aggregate with reduceat instead of a sort each
+        finest = cell_degrees(MAX_LEVEL)
+        column = np.clip(np.floor((lon + 180.0) / finest), 0, 360.0 / finest - 1).astype(np.uint64)
+        row = np.clip(np.floor((lat + 90.0) / finest), 0, 180.0 / finest - 1).astype(np.uint64)
+        keys = _interleave(column) | (_interleave(row) << np.uint64(1))
+        order = np.argsort(keys)
+        keys, column, row = keys[order], column[order], row[order]
+        count, lat, lon = count[order], lat[order], lon[order]
+
+        self.levels = []
+        for level in range(MAX_LEVEL + 1):
+            shift = MAX_LEVEL - level
+            level_keys = keys >> np.uint64(2 * shift)
+            starts = np.flatnonzero(np.concatenate([[True], level_keys[1:] != level_keys[:-1]]))[:len(keys)]
+            if level > 0 and len(starts) * MIN_POINTS_PER_CELL > self.num_points:
+                # Finer levels only get sparser, raw points take over from here
+                break
+            self.levels.append(_Level(
+                (column[starts] >> np.uint64(shift)).astype(np.int64),
+                (row[starts] >> np.uint64(shift)).astype(np.int64),
+                _run_sums(count, starts),
+                np.diff(np.append(starts, len(keys))),
+                _run_sums(lat, starts),
+                _run_sums(lon, starts),
+                order[starts],
+            ))
+
+    @property
+    def finest_level(self):
+        return len(self.levels) - 1
+
+    # Level whose cells give about TARGET_COLUMNS columns across lon_span degrees
+    def level_for_span(self, lon_span):
+        wanted = lon_span / TARGET_COLUMNS
+        return int(np.clip(np.ceil(np.log2(BASE_CELL_DEGREES / max(wanted, 1e-9))), 0, MAX_LEVEL))
+
+    # Longitude ranges of a viewport, split in two when it crosses the dateline
+    @staticmethod
+    def _lon_ranges(lon_min, lon_max):
+        if lon_max - lon_min >= 360:
+            return [(-180.0, 180.0)]
+        span = max(lon_max - lon_min, 0.0)
+        lon_min = (lon_min + 180.0) % 360.0 - 180.0
+        lon_max = lon_min + span
+        if lon_max <= 180:
+            return [(lon_min, lon_max)]
+        return [(lon_min, 180.0), (-180.0, lon_max - 360.0)]
+
+    def _level_cells(self, level, lon_ranges, lat_min, lat_max):
+        cells = self.levels[level]
+        size = cell_degrees(level)
+        row_min, row_max = np.floor((lat_min + 90) / size), np.floor((lat_max + 90) / size)
+        selected = []
+        for lon_min, lon_max in lon_ranges:
+            lo = np.searchsorted(cells.column, np.floor((lon_min + 180) / size), side='left')
+            hi = np.searchsorted(cells.column, np.floor((lon_max + 180) / size), side='right')
+            rows = cells.row[lo:hi]
+            selected.append(lo + np.flatnonzero((rows >= row_min) & (rows <= row_max)))
+        return np.concatenate(selected)
+
+    def _raw_points(self, lon_ranges, lat_min, lat_max):
+        selected = []
+        for lon_min, lon_max in lon_ranges:
+            lo = np.searchsorted(self.point_lon, lon_min, side='left')
+            hi = np.searchsorted(self.point_lon, lon_max, side='right')
+            lats = self.point_lat[lo:hi]
+            selected.append(lo + np.flatnonzero((lats >= lat_min) & (lats <= lat_max)))
+        return np.concatenate(selected)
+
+    # Clusters inside the viewport at a resolution matching its size, at most
+    # max_clusters of them. Returns lat, lon, count, points (per cluster) and
+    # position (row of the point for single-point clusters, else -1) plus the
+    # level used (None when raw points are returned).
+    def query(self, lon_min, lon_max, lat_min, lat_max, max_clusters=MAX_CLUSTERS):
+        lon_ranges = self._lon_ranges(lon_min, lon_max)
+        level = self.level_for_span(lon_max - lon_min)
+
+        if level > self.finest_level:
+            selected = self._raw_points(lon_ranges, lat_min, lat_max)
+            if len(selected) <= max_clusters:
+                return {
+                    'lat': self.point_lat[selected],
+                    'lon': self.point_lon[selected],
+                    'count': self.point_count[selected],
+                    'points': np.ones(len(selected), dtype=np.int64),
+                    'position': self.point_order[selected],
+                    'level': None,
+                }
+            level = self.finest_level
+
+        level = min(level, self.finest_level)
+        selected = self._level_cells(level, lon_ranges, lat_min, lat_max)
+        while len(selected) > max_clusters and level > 0:
+            level -= 1
+            selected = self._level_cells(level, lon_ranges, lat_min, lat_max)
+
+        cells = self.levels[level]
+        points = cells.points[selected]
+        return {
+            'lat': cells.lat[selected],
+            'lon': cells.lon[selected],
+            'count': cells.count[selected],
+            'points': points,
+            'position': np.where(points == 1, cells.first[selected], -1),
+            'level': level,
+        }
+
+    def memory_usage(self):
+        arrays = [self.point_order, self.point_lat, self.point_lon, self.point_count]
+        for cells in self.levels:
+            arrays += [value for value in vars(cells).values() if isinstance(value, np.ndarray)]
+        return sum(array.nbytes for array in arrays)
+
+
+# Whole-world grids of summed count, one per level. The finest grid is a
+# weighted 2D histogram of the points; every coarser grid sums 2x2 blocks of
+# the one below and is built the first time that zoom level is shown, so
+# panning at a zoom level only slices an existing grid.
+class DensityGrids:
+    def __init__(self, lat, lon, count=None, max_level=DENSITY_MAX_LEVEL):
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        self.max_level = max_level
+        rows, columns = 4 * 2 ** max_level, 8 * 2 ** max_level
+        # Equal-width bins, so the bin of a point is computed directly and
+        # counted with bincount (same result as np.histogram2d, much faster)
+        size = cell_degrees(max_level)
+        row = np.clip(np.floor((lat + 90.0) / size), 0, rows - 1).astype(np.int64)
+        column = np.clip(np.floor((lon + 180.0) / size), 0, columns - 1).astype(np.int64)
+        weights = None if count is None else np.asarray(count, dtype=np.float64)
+        grid = np.bincount(row * columns + column, weights=weights, minlength=rows * columns)
+        self._grids = {max_level: grid.reshape(rows, columns).astype(np.float64)}
+        self._lock = threading.Lock()
+
+    def grid(self, level):
+        level = int(np.clip(level, 0, self.max_level))
+        with self._lock:
+            finer = level
+            while finer not in self._grids:
+                finer += 1
+            for current in range(finer - 1, level - 1, -1):
+                below = self._grids[current + 1]
+                rows, columns = below.shape
+                self._grids[current] = below.reshape(rows // 2, 2, columns // 2, 2).sum(axis=(1, 3))
+            return self._grids[level]
+
+    # Non-empty cells in the viewport as (lat, lon, weight, level), coarsening
+    # the level until at most max_cells remain
+    def cells(self, lon_min, lon_max, lat_min, lat_max, max_cells=MAX_DENSITY_CELLS):
+        span = max(lon_max - lon_min, 1e-9)
+        level = int(np.clip(np.ceil(np.log2(BASE_CELL_DEGREES * DENSITY_COLUMNS / span)), 0, self.max_level))
+        while True:
+            grid = self.grid(level)
+            size = cell_degrees(level)
+            rows, columns = grid.shape
+            row_range = np.arange(max(int((lat_min + 90) // size), 0), min(int((lat_max + 90) // size), rows - 1) + 1)
+            first = int(np.floor((lon_min + 180) / size))
+            # Columns wrap around the dateline
+            column_range = np.arange(first, first + min(int(np.ceil(span / size)) + 1, columns)) % columns
+            window = grid[np.ix_(row_range, column_range)]
+            row_index, column_index = np.nonzero(window)
+            if len(row_index) <= max_cells or level == 0:
+                break
+            level -= 1
+        return (
+            -90.0 + (row_range[row_index] + 0.5) * size,
+            -180.0 + (column_range[column_index] + 0.5) * size,
+            window[row_index, column_index],
+            level,
+        )
+
+
+# Visible lon/lat box for a Scattergeo view (projection scale and center),
+# padded so small pans still show clusters until the next update arrives
+def viewport_bounds(scale, center_lon, center_lat, padding=1.25):
+    half_lon = WORLD_SPAN[0] / 2 / max(scale, 1e-6) * padding
+    half_lat = WORLD_SPAN[1] / 2 / max(scale, 1e-6) * padding
+    return (center_lon - half_lon, center_lon + half_lon,
+            max(center_lat - half_lat, -90.0), min(center_lat + half_lat, 90.0))
+
+
+# Pyramid for one dataset version, built on first use
+def cached_pyramid(name, version, frame):
+    key = (name, version)
+    with _pyramid_lock:
+        pyramid = _pyramid_cache.get(key)
+        if pyramid is None:
+            # Older versions of the same map are never asked for again
+            for old_key in [k for k in _pyramid_cache if k[0] == name and k[1] != version]:
+                del _pyramid_cache[old_key]
+            pyramid = ClusterPyramid(frame['lat'].to_numpy(), frame['lon'].to_numpy(),
+                                     frame['count'].to_numpy() if 'count' in frame.columns else None)
+            _pyramid_cache[key] = pyramid
+        return pyramid
+
+
+# Density grids for one dataset version, built on first use
+def cached_density(name, version, frame):
+    key = (name, version)
+    with _pyramid_lock:
+        grids = _density_cache.get(key)
+        if grids is None:
+            for old_key in [k for k in _density_cache if k[0] == name and k[1] != version]:
+                del _density_cache[old_key]
+            grids = DensityGrids(frame['lat'].to_numpy(), frame['lon'].to_numpy(),
+                                 frame['count'].to_numpy() if 'count' in frame.columns else None)
+            _density_cache[key] = grids
+        return grids
+
+
+# Visible lon/lat box of a tile map view: the corners the map reported after
+# its last move, else the whole world (the first render, before any move)
+def map_bounds(view):
+    return tuple(view.get('bounds') or (-180.0, 180.0, -90.0, 90.0))
+
+
+# On-screen width in pixels of a cell `degrees` wide at tile map zoom `zoom`
+def map_cell_px(degrees, zoom):
+    return degrees * MAP_TILE_PX * 2 ** zoom / 360.0
+
+
+# Map view the figure starts with: projection scale of the Scattergeo map,
+# zoom of the tile map (density mode), and the center both share
+DEFAULT_VIEW = {'scale': 1.3, 'zoom': 1.0, 'lon': 0.0, 'lat': 20.0}
+
+
+# Merge a relayoutData event into the previous view. Events only carry what
+# changed: for the Scattergeo map e.g. {'geo.projection.scale': 2.1} or the new
+# center as 'geo.center.lon' / 'geo.center.lat' (or one 'geo.center' dict); for
+# the tile map 'map.zoom', 'map.center' and the corners in 'map._derived'.
+def update_view(view, relayout_data):
+    view = {**DEFAULT_VIEW, **(view or {})}
+    if not relayout_data:
+        return view
+    center = relayout_data.get('geo.center') or relayout_data.get('map.center') or {}
+    if 'geo.projection.scale' in relayout_data:
+        view['scale'] = float(relayout_data['geo.projection.scale'])
+    if 'map.zoom' in relayout_data:
+        view['zoom'] = float(relayout_data['map.zoom'])
+    lon = relayout_data.get('geo.center.lon', center.get('lon', relayout_data.get('geo.projection.rotation.lon')))
+    lat = relayout_data.get('geo.center.lat', center.get('lat'))
+    if lon is not None:
+        view['lon'] = float(lon)
+    if lat is not None:
+        view['lat'] = float(lat)
+    corners = (relayout_data.get('map._derived') or {}).get('coordinates')
+    if corners:
+        lons, lats = zip(*corners)
+        view['bounds'] = [min(lons), min(max(lons), min(lons) + 360.0), max(min(lats), -90.0), min(max(lats), 90.0)]
+    elif any(key.startswith('geo') for key in relayout_data):
+        # The tile map will open on the new center, not where it was left
+        view.pop('bounds', None)
+    return view
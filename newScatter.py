@@ -1,9 +1,14 @@
 import dash
 from dash import dcc, html, Input, Output
 import plotly.graph_objects as go
+import numpy as np
 import pandas as pd
 import dash_bootstrap_components as dbc
 
+from callbackMetrics import instrument
+from entityStore import get_store, register_loader
+from scatterLines import drop_line_trace
+
 # Sample data with 'status' and 'label' columns
 data = {
     'x': [1, 2, 3, 4, 5],
@@ -12,7 +17,12 @@ data = {
     'label': ['A', 'B', 'C', 'D', 'E'],
     'status': ['up', 'down', 'pending', 'down', 'up']  # Status values
 }
-df = pd.DataFrame(data)
+STORE_NAME = 'scatter-status'
+register_loader(STORE_NAME, lambda: (pd.DataFrame(data), {'id_column': None, 'label_column': 'label'}))
+store = get_store(STORE_NAME)
+
+# Most drop lines drawn; larger data sets show an evenly spaced sample
+MAX_DROP_LINES = 20000
 
 # Define color mapping for each status
 status_colors = {
@@ -44,21 +54,16 @@ def create_scatter_plot_with_lines(data):
             )
             scatter_traces.append(scatter_trace)
 
-    # Line traces for each point connecting to Z-axis
-    line_traces = []
-    for i in range(len(data)):
-        line_trace = go.Scatter3d(
-            x=[data['x'].iloc[i], data['x'].iloc[i]],
-            y=[data['y'].iloc[i], data['y'].iloc[i]],
-            z=[0, data['z'].iloc[i]],  # Line from z=0 to the point's z value
-            mode='lines',
-            line=dict(color='gray', width=2),
-            showlegend=False  # Don't show lines in the legend
-        )
-        line_traces.append(line_trace)
+    # Lines from every point down to z=0, all in one trace
+    line_trace = drop_line_trace(
+        data['x'], data['y'], data['z'],
+        customdata=np.column_stack([data['label'].to_numpy(dtype=object), data['status'].to_numpy(dtype=object)]),
+        max_lines=MAX_DROP_LINES,
+        hovertemplate="Label: %{customdata[0]}<br>Status: %{customdata[1]}<extra></extra>"
+    )
 
     # Combine all traces into the figure
-    fig = go.Figure(data=scatter_traces + line_traces)
+    fig = go.Figure(data=scatter_traces + [line_trace])
     fig.update_layout(
         margin=dict(l=0, r=0, t=30, b=0),
         scene=dict(zaxis_title='Z Axis')
@@ -67,6 +72,7 @@ def create_scatter_plot_with_lines(data):
 
 # Create the Dash app
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+instrument(app)
 
 app.layout = dbc.Container(fluid=True, children=[
     html.H2("3D Scatter Plot with Node Details on Click"),
@@ -74,7 +80,7 @@ app.layout = dbc.Container(fluid=True, children=[
     # Graph for the scatter plot
     dcc.Graph(
         id="scatter-plot",
-        figure=create_scatter_plot_with_lines(df),
+        figure=create_scatter_plot_with_lines(store.frame),
         style={'height': '400px'}
     ),
     
@@ -93,11 +99,14 @@ def display_node_details(clickData):
     
     # Extract information about the clicked node
     point_data = clickData['points'][0]
-    label = point_data['text']
+    # Marker points carry the label as text, drop lines in their customdata
+    label = point_data['text'] if 'text' in point_data else point_data['customdata'][0]
     x = point_data['x']
     y = point_data['y']
     z = point_data['z']
-    status = next((df[df['label'] == label]['status'].values[0]), "Unknown")
+    # Hash lookup of the clicked label in the entity store
+    node_info = get_store(STORE_NAME).get_by_label(label)
+    status = node_info['status'] if node_info else "Unknown"
 
     # Display node details
     details = f"""
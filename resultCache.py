@@ -0,0 +1,124 @@
+import functools
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from filterIndex import normalise_filter_value
+
+
+# Items serialised to estimate the size of a long list
+SIZE_SAMPLE = 64
+
+
+# Approximate size of a callback result: the length of its JSON payload
+def payload_size(value):
+    return len(json.dumps(value, default=str, separators=(',', ':')))
+
+
+# payload_size of a long list (e.g. graph elements) extrapolated from an evenly
+# spaced sample, as its items are alike and serialising all of them would cost
+# as much as sending them; other values are measured in full
+def estimated_payload_size(value, sample_size=SIZE_SAMPLE):
+    if not isinstance(value, (list, tuple)) or len(value) <= sample_size:
+        return payload_size(value)
+    step = len(value) / sample_size
+    sample = [value[int(i * step)] for i in range(sample_size)]
+    return int(payload_size(sample) * len(value) / sample_size)
+
+
+# LRU cache bounded by the total payload bytes it holds. Every entry belongs to
+# one dataset version; asking for a newer version drops everything cached for
+# the old one, so reloading the AIT DataFrame invalidates the cache by itself.
+# With ttl (seconds) entries also expire, for data that changes underneath us.
+class ResultCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.version = None
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.expirations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        if version != self.version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.current_bytes = 0
+            self.version = version
+
+    def get(self, key, version):
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= time.monotonic():
+                self.current_bytes -= self._entries.pop(key)[1]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, version, value, size=None):
+        size = estimated_payload_size(value) if size is None else size
+        with self._lock:
+            self._check_version(version)
+            if size > self.max_bytes:
+                # Larger than the whole budget, never worth caching
+                return
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key)[1]
+            expires = time.monotonic() + self.ttl if self.ttl is not None else None
+            self._entries[key] = (value, size, expires)
+            self.current_bytes += size
+
+            # Evict least recently used entries until we are back under budget
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'version': self.version,
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'expirations': self.expirations,
+            }
+
+
+# Decorator caching a filter callback on its normalised arguments plus the
+# current dataset version (get_version is called on every invocation)
+def cached_callback(cache, get_version):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args):
+            key = (func.__name__,) + tuple(normalise_filter_value(arg) for arg in args)
+            version = get_version()
+            result = cache.get(key, version)
+            if result is None:
+                result = func(*args)
+                cache.put(key, version, result)
+            return result
+        return wrapper
+    return decorator
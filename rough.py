@@ -1,10 +1,47 @@
-from flask import Flask, jsonify
-import pymssql
+import hashlib
+import os
+import sqlite3
+
+from flask import Flask, Response, abort, jsonify, request
+
+from dataFormats import (COMPRESS_MIN_BYTES, FORMATS, arrow_stream_chunks, available_encodings, available_formats,
+                         columns_json_chunks, compress, compress_chunks, sql_server_arrow_type, sqlite_arrow_type)
+from dbPool import ConnectionPool, SingleFlight
+from resultCache import ResultCache
+
+try:
+    import pymssql
+except ImportError:  # only the SQLite stand-in is available
+    pymssql = None
 
 app = Flask(__name__)
 
+TABLE_NAME = 'your_table_name'  # Replace with your table
+KEY_COLUMN = 'id'  # Unique, indexed column used for keyset pagination
+FETCH_BATCH_SIZE = 1000  # Rows per fetchmany() round trip
+MAX_LIMIT = 100_000  # Largest page a client can ask for
+POOL_SIZE = 8  # Most connections open at once
+RESPONSE_TTL = 5.0  # Seconds a rendered page is served from memory
+
+# Path of a SQLite file to use instead of SQL Server (local testing)
+SQLITE_ENV = 'DATA_SQLITE_PATH'
+
+_table_columns = None
+_column_types = None
+
+
+# DB-API module behind get_db_connection; decides placeholders and LIMIT/TOP
+def get_db_driver():
+    return sqlite3 if os.environ.get(SQLITE_ENV) else pymssql
+
+
 # Database connection function
 def get_db_connection():
+    sqlite_path = os.environ.get(SQLITE_ENV)
+    if sqlite_path:
+        # Pooled connections move between request threads
+        return sqlite3.connect(sqlite_path, check_same_thread=False)
+
     # Replace with your SQL Server details
     conn = pymssql.connect(
         server='your_server_address',  # e.g., localhost or IP
@@ -15,22 +52,231 @@ def get_db_connection():
     )
     return conn
 
+
+pool = ConnectionPool(get_db_connection, max_size=POOL_SIZE)
+flights = SingleFlight()
+# Rendered pages (body, etag), keyed on query and format
+page_cache = ResultCache(max_bytes=64 * 1024 * 1024, ttl=RESPONSE_TTL)
+
+
+# Column names of the table, read once; projections are checked against them
+# because identifiers cannot be passed as query parameters
+def get_table_columns():
+    global _table_columns
+    if _table_columns is None:
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT * FROM {TABLE_NAME} WHERE 1 = 0")
+            _table_columns = [column[0] for column in cursor.description]
+            cursor.close()
+    return _table_columns
+
+
+# Arrow type of every column from its declared SQL type (None where that does
+# not fix one), read once so streams know their schema before the first row
+def get_column_types():
+    global _column_types
+    if _column_types is None:
+        with pool.connection() as conn:
+            cursor = conn.cursor()
+            if get_db_driver() is sqlite3:
+                cursor.execute(f"PRAGMA table_info({TABLE_NAME})")
+                _column_types = {name: sqlite_arrow_type(declared) for _, name, declared, *_ in cursor.fetchall()}
+            else:
+                cursor.execute("SELECT COLUMN_NAME, DATA_TYPE, NUMERIC_PRECISION, NUMERIC_SCALE "
+                               "FROM INFORMATION_SCHEMA.COLUMNS WHERE TABLE_NAME = %s", (TABLE_NAME,))
+                _column_types = {name: sql_server_arrow_type(data_type, precision, scale)
+                                 for name, data_type, precision, scale in cursor.fetchall()}
+            cursor.close()
+    return _column_types
+
+
+# SELECT for one page: projected columns, rows after the key, in key order
+def build_query(columns, after, limit):
+    driver = get_db_driver()
+    is_sqlite = driver is sqlite3
+    placeholder = '?' if driver.paramstyle == 'qmark' else '%s'
+    top = f"TOP ({limit}) " if limit and not is_sqlite else ""
+    query = f"SELECT {top}{', '.join(columns)} FROM {TABLE_NAME}"
+    params = ()
+    if after is not None:
+        query += f" WHERE {KEY_COLUMN} > {placeholder}"
+        params = (after,)
+    query += f" ORDER BY {KEY_COLUMN}"
+    if limit and is_sqlite:
+        query += f" LIMIT {limit}"
+    return query, params
+
+
+# (column names, row tuples) batches, one per fetchmany() round trip, on a
+# pooled connection that goes back to the pool when exhausted or when the
+# client goes away
+def iter_batches(query, params):
+    conn, created = pool.acquire()
+    broken = False
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        columns = [column[0] for column in cursor.description]
+        rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+        # An empty result still sends one (empty) batch so the columns are known
+        yield columns, rows
+        while rows:
+            rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+            if rows:
+                yield columns, rows
+        cursor.close()
+    except Exception:
+        broken = True
+        raise
+    finally:
+        pool.release(conn, created, broken)
+
+
+# Every batch goes out as one chunk so the response is never held in memory
+def _ndjson(batches):
+    for columns, rows in batches:
+        yield ''.join(app.json.dumps(dict(zip(columns, row))) + '\n' for row in rows)
+
+
+def _json_array(batches):
+    yield '['
+    first = True
+    for columns, rows in batches:
+        # Serialise the batch as a list and drop its brackets
+        body = app.json.dumps([dict(zip(columns, row)) for row in rows])[1:-1]
+        if not body:
+            continue
+        yield body if first else ',' + body
+        first = False
+    yield ']'
+
+
+def _columns_json(batches):
+    return columns_json_chunks(batches, dumps=app.json.dumps)
+
+
+def _arrow(batches):
+    return arrow_stream_chunks(batches, types=get_column_types())
+
+
+WRITERS = {
+    'json': _json_array,
+    'ndjson': _ndjson,
+    'columns': _columns_json,
+    'arrow': _arrow,
+}
+
+
+def _prepend(first, rest):
+    yield first
+    yield from rest
+
+
+# Response format from ?format= or else the Accept header (JSON by default)
+def negotiate_format():
+    formats = available_formats()
+    requested = request.args.get('format')
+    if requested:
+        if requested not in formats:
+            abort(406, f"format must be one of {', '.join(formats)}")
+        return requested
+    mimetype = request.accept_mimetypes.best_match([FORMATS[name] for name in formats], default=FORMATS['json'])
+    return next(name for name in formats if FORMATS[name] == mimetype)
+
+
+# Best compression the client accepts, or None
+def negotiate_encoding():
+    for encoding in available_encodings():
+        if request.accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+# Whole page rendered in memory with its ETag. Concurrent identical requests
+# share one query, and repeats within RESPONSE_TTL skip the database.
+def render_page(query, params, data_format, encoding):
+    key = (query, params, data_format, encoding)
+    page = page_cache.get(key, TABLE_NAME)
+    if page is not None:
+        return page
+
+    def run_query():
+        page = page_cache.get(key, TABLE_NAME)
+        if page is None:
+            chunks = WRITERS[data_format](iter_batches(query, params))
+            body = b''.join(chunk.encode() if isinstance(chunk, str) else chunk for chunk in chunks)
+            used_encoding = None
+            if encoding and len(body) >= COMPRESS_MIN_BYTES:
+                body, used_encoding = compress(body, encoding), encoding
+            page = (body, hashlib.blake2b(body, digest_size=16).hexdigest(), used_encoding)
+            page_cache.put(key, TABLE_NAME, page, size=len(body))
+        return page
+
+    return flights.do(key, run_query)
+
+
+# GET /data returns the table as a JSON array (default), NDJSON, column
+# batches as JSON or an Arrow IPC stream, chosen with ?format=json|ndjson|
+# columns|arrow or the Accept header. Large bodies are compressed with zstd or
+# gzip when the client accepts them. Optional parameters:
+#   columns=a,b   only these columns (the key column is always included)
+#   after=<key>   rows with KEY_COLUMN greater than this value
+#   limit=<n>     at most n rows; the next page starts after the last key
+#   stream=0      render in one piece even without a limit
+# Pages with a limit (or stream=0) are rendered in memory, cached briefly and
+# carry an ETag, so a poll with If-None-Match gets 304. Unlimited requests
+# are streamed batch by batch.
 @app.route('/data', methods=['GET'])
 def get_data():
-    # Connect to the database and execute query
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    query = "SELECT * FROM your_table_name"  # Replace with your query
-    cursor.execute(query)
-    rows = cursor.fetchall()
-    conn.close()
-
-    # Convert rows to a list of dictionaries
-    columns = [column[0] for column in cursor.description]
-    data = [dict(zip(columns, row)) for row in rows]
-
-    # Return data as JSON
-    return jsonify(data)
+    table_columns = get_table_columns()
+    columns = table_columns
+    if request.args.get('columns'):
+        columns = [column.strip() for column in request.args['columns'].split(',') if column.strip()]
+        unknown = sorted(set(columns) - set(table_columns))
+        if unknown:
+            abort(400, f"Unknown columns: {', '.join(unknown)}")
+        if KEY_COLUMN in table_columns and KEY_COLUMN not in columns:
+            columns = [KEY_COLUMN] + columns
+
+    limit = request.args.get('limit', type=int)
+    if limit is not None and not 0 < limit <= MAX_LIMIT:
+        abort(400, f"limit must be between 1 and {MAX_LIMIT}")
+    after = request.args.get('after')
+    query, params = build_query(columns, after, limit)
+
+    data_format = negotiate_format()
+    encoding = negotiate_encoding()
+
+    if limit is not None or request.args.get('stream') == '0':
+        body, etag, used_encoding = render_page(query, params, data_format, encoding)
+        response = Response(body, mimetype=FORMATS[data_format])
+        response.set_etag(etag)
+        if used_encoding:
+            response.headers['Content-Encoding'] = used_encoding
+        response.vary.update(['Accept', 'Accept-Encoding'])
+        return response.make_conditional(request)
+
+    # Not make_conditional: it would compute a Content-Length and so pull the
+    # whole stream into memory before the first byte goes out. The query and
+    # the first batch do run now, so their errors (a bad query, a value that
+    # does not fit the Arrow schema) are a 500 instead of a truncated body.
+    batches = iter_batches(query, params)
+    chunks = WRITERS[data_format](_prepend(next(batches), batches))
+    chunks = _prepend(next(chunks), chunks)
+    if encoding:
+        chunks = compress_chunks(chunks, encoding)
+    response = Response(chunks, mimetype=FORMATS[data_format])
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.update(['Accept', 'Accept-Encoding'])
+    return response
+
+
+# Pool, coalescing and page cache counters
+@app.route('/cache-stats')
+def cache_stats():
+    return jsonify({'pool': pool.stats(), 'single_flight': flights.stats(), 'pages': page_cache.stats()})
 
 if __name__ == '__main__':
     app.run(debug=True)
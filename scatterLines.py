@@ -0,0 +1,52 @@
+import numpy as np
+import plotly.graph_objects as go
+
+
+# Evenly spaced subset of at most max_points row positions (all rows if no cap)
+def sample_positions(num_points, max_points=None):
+    if max_points is None or num_points <= max_points:
+        return np.arange(num_points)
+    return np.unique(np.linspace(0, num_points - 1, max_points).astype(np.int64))
+
+
+# Interleave per-point start/end values into one [start, end, gap] array
+def _segments(start, end, gap):
+    values = np.empty(3 * len(end), dtype=np.result_type(start, end, gap))
+    values[0::3] = start
+    values[1::3] = end
+    values[2::3] = gap
+    return values
+
+
+# All z-axis drop lines of a 3D scatter as ONE Scatter3d trace: every point
+# contributes (x, y, base) -> (x, y, z) followed by a NaN gap, so plotly draws
+# separate segments. customdata (n x k, e.g. label and status) is repeated per
+# vertex so hovering or clicking a line tells which point it belongs to.
+# max_lines caps the number of lines (evenly sampled) for very large data.
+def drop_line_trace(x, y, z, customdata=None, max_lines=None, base=0.0, hovertemplate=None,
+                    line=None, name='Drop lines'):
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    z = np.asarray(z, dtype=np.float64)
+    positions = sample_positions(len(x), max_lines)
+    x, y, z = x[positions], y[positions], z[positions]
+
+    trace_customdata = None
+    if customdata is not None:
+        customdata = np.asarray(customdata, dtype=object)
+        if customdata.ndim == 1:
+            customdata = customdata[:, None]
+        trace_customdata = np.repeat(customdata[positions], 3, axis=0)
+
+    return go.Scatter3d(
+        x=_segments(x, x, np.nan),
+        y=_segments(y, y, np.nan),
+        z=_segments(np.full(len(z), base), z, np.nan),
+        mode='lines',
+        line=line or dict(color='gray', width=2),
+        customdata=trace_customdata,
+        hovertemplate=hovertemplate,
+        connectgaps=False,
+        name=name,
+        showlegend=False  # Don't show lines in the legend
+    )
@@ -1,7 +1,13 @@
-from dash import dcc, html, Input, Output, callback
+import threading
+
+from dash import dcc, html, Input, Output, State, callback, clientside_callback
 import plotly.express as px
 import pandas as pd
 
+from callbackMetrics import observe
+from entityStore import get_store, register_loader
+from resultCache import ResultCache
+
 # Sample data
 data = {
     'x': [1, 2, 3, 4, 5],
@@ -9,35 +15,91 @@ data = {
     'z': [5, 6, 7, 8, 4],
     'label': ['A', 'B', 'C', 'D', 'E']
 }
-df = pd.DataFrame(data)
-
-# Create initial 3D scatter plot figure
-fig = px.scatter_3d(df, x='x', y='y', z='z', color='label', title="3D Scatter Plot")
-
-# Layout with filter dropdown and graph
-layout = html.Div([
-    html.H2("Interactive 3D Scatter Plot Page"),
-    html.Label("Filter by Label:"),
-    dcc.Dropdown(
-        id='label-filter',
-        options=[{'label': lbl, 'value': lbl} for lbl in df['label'].unique()],
-        value=None,
-        placeholder="Select a label"
-    ),
-    dcc.Graph(id='3d-scatter-plot', figure=fig),
-    html.Div(id='click-data')
-])
+STORE_NAME = 'scatter-points'
+register_loader(STORE_NAME, lambda: (pd.DataFrame(data), {'id_column': None, 'label_column': 'label'}))
+
+# Filter by label in the browser (True) or rebuild the figure on the server
+CLIENTSIDE_FILTER = True
+
+# Figures keyed on the selected label (None = all points) for the current
+# dataset version; a reload of the store drops them all
+figure_cache = ResultCache(max_bytes=64 * 1024 * 1024)
+_figure_lock = threading.Lock()
+
+
+def build_figure(frame):
+    fig = px.scatter_3d(frame, x='x', y='y', z='z', color='label', title="3D Scatter Plot")
+    # Keep the camera when the figure is swapped for a filtered one
+    fig.update_layout(uirevision=STORE_NAME)
+    return fig
+
+
+# Figure for one label (or all points), built once per data version
+def label_figure(selected_label=None):
+    store = get_store(STORE_NAME)
+    fig = figure_cache.get(selected_label, store.data_version)
+    if fig is None:
+        with _figure_lock:
+            fig = figure_cache.get(selected_label, store.data_version)
+            if fig is None:
+                frame = store.frame
+                if selected_label is not None:
+                    frame = frame[frame['label'] == selected_label]
+                fig = build_figure(frame)
+                figure_cache.put(selected_label, store.data_version, fig, size=len(fig.to_json()))
+    return fig
+
+
+# Layout with filter dropdown and graph, built when the page is first shown
+def layout():
+    df = get_store(STORE_NAME).frame
+    return html.Div([
+        html.H2("Interactive 3D Scatter Plot Page"),
+        html.Label("Filter by Label:"),
+        dcc.Dropdown(
+            id='label-filter',
+            options=[{'label': lbl, 'value': lbl} for lbl in df['label'].unique()],
+            value=None,
+            placeholder="Select a label"
+        ),
+        dcc.Graph(id='3d-scatter-plot', figure=label_figure()),
+        html.Div(id='click-data')
+    ])
 
 # Define callbacks directly within this module
 
-# Update 3D scatter plot based on dropdown selection
-@callback(
-    Output('3d-scatter-plot', 'figure'),
-    [Input('label-filter', 'value')]
-)
+# Update 3D scatter plot based on dropdown selection (server-side fallback)
 def update_figure(selected_label):
-    filtered_df = df if selected_label is None else df[df['label'] == selected_label]
-    return px.scatter_3d(filtered_df, x='x', y='y', z='z', color='label', title="3D Scatter Plot")
+    fig = label_figure(selected_label)
+    observe('points_plotted', sum(len(trace.x) for trace in fig.data))
+    return fig
+
+
+if CLIENTSIDE_FILTER:
+    # The full figure has one trace per label (named after it); filtering only
+    # flips trace visibility in the browser, without a server round trip
+    clientside_callback(
+        """
+        function(selectedLabel, figure) {
+            if (!figure) {
+                return window.dash_clientside.no_update;
+            }
+            const data = figure.data.map(trace => Object.assign({}, trace, {
+                visible: selectedLabel === null || selectedLabel === undefined
+                    || trace.name === String(selectedLabel)
+            }));
+            return Object.assign({}, figure, {data: data});
+        }
+        """,
+        Output('3d-scatter-plot', 'figure'),
+        Input('label-filter', 'value'),
+        State('3d-scatter-plot', 'figure')
+    )
+else:
+    update_figure = callback(
+        Output('3d-scatter-plot', 'figure'),
+        [Input('label-filter', 'value')]
+    )(update_figure)
 
 # Display click data
 @callback(
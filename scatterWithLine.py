@@ -3,6 +3,9 @@ import plotly.graph_objects as go
 import pandas as pd
 import dash_bootstrap_components as dbc
 
+from entityStore import get_store, register_loader
+from scatterLines import drop_line_trace
+
 # Sample data
 data = {
     'x': [1, 2, 3, 4, 5],
@@ -10,7 +13,11 @@ data = {
     'z': [5, 6, 7, 8, 4],
     'label': ['A', 'B', 'C', 'D', 'E']
 }
-df = pd.DataFrame(data)
+STORE_NAME = 'scatter-points'
+register_loader(STORE_NAME, lambda: (pd.DataFrame(data), {'id_column': None, 'label_column': 'label'}))
+
+# Most drop lines drawn; larger data sets show an evenly spaced sample
+MAX_DROP_LINES = 20000
 
 # Function to create a 3D scatter plot with vertical lines to the Z-axis
 def create_scatter_plot_with_lines(data, title):
@@ -25,21 +32,16 @@ def create_scatter_plot_with_lines(data, title):
         hovertemplate="Label: %{text}<br>X: %{x}<br>Y: %{y}<br>Z: %{z}<extra></extra>"
     )
 
-    # Create a line trace for each point to connect it to the Z-axis
-    line_traces = []
-    for i in range(len(data)):
-        line_trace = go.Scatter3d(
-            x=[data['x'].iloc[i], data['x'].iloc[i]],
-            y=[data['y'].iloc[i], data['y'].iloc[i]],
-            z=[0, data['z'].iloc[i]],  # Line from z=0 to the point's z value
-            mode='lines',
-            line=dict(color='gray', width=2),
-            showlegend=False
-        )
-        line_traces.append(line_trace)
+    # Lines from every point down to z=0, all in one trace
+    line_trace = drop_line_trace(
+        data['x'], data['y'], data['z'],
+        customdata=data['label'].to_numpy(dtype=object),
+        max_lines=MAX_DROP_LINES,
+        hovertemplate="Label: %{customdata[0]}<extra></extra>"
+    )
 
-    # Combine the scatter plot trace with all the line traces
-    fig = go.Figure(data=[scatter_trace] + line_traces)
+    # Combine the scatter plot trace with the line trace
+    fig = go.Figure(data=[scatter_trace, line_trace])
     fig.update_layout(
         title=title,
         margin=dict(l=0, r=0, t=30, b=0),
@@ -47,8 +49,9 @@ def create_scatter_plot_with_lines(data, title):
     )
     return dcc.Graph(figure=fig, style={'height': '400px'})
 
-# Layout with a single scatter plot
-layout = dbc.Container(fluid=True, children=[
-    html.H2("3D Scatter Plot with Lines to Z-axis"),
-    create_scatter_plot_with_lines(df, "3D Scatter with Z-Axis Lines")
-])
+# Layout with a single scatter plot, built when the page is first shown
+def layout():
+    return dbc.Container(fluid=True, children=[
+        html.H2("3D Scatter Plot with Lines to Z-axis"),
+        create_scatter_plot_with_lines(get_store(STORE_NAME).frame, "3D Scatter with Z-Axis Lines")
+    ])
@@ -1,50 +1,36 @@
 import dash
 from dash import dcc, html, Input, Output
+from flask import jsonify
 import dash_cytoscape as cyto
-import pandas as pd
+import numpy as np
 
-# Sample DataFrame with multiple upstream and downstream connections
-data = {
-    'ait_name': ['AIT1', 'AIT2', 'AIT3', 'AIT4'],
-    'id': ['1', '2', '3', '4'],
-    'upstream': [['2', '3'], ['3'], ['1'], []],       # Multiple upstream connections
-    'downstream': [['2'], ['1', '3'], ['1'], ['2']],  # Multiple downstream connections
-    'risk_factor': [3, 2, 5, 4],
-    'recovery_time': ['tier 1', 'tier 2', 'tier 3', 'tier 1'],
-    'business_name': ['Business A', 'Business B', 'Business A', 'Business C'],
-    'status': ['online', 'offline', 'online', 'offline']  # New 'status' column
-}
-df = pd.DataFrame(data)
+from callbackMetrics import instrument, observe
+from entityStore import get_store, load_store
+from filterIndex import normalise_filter_value
+from graphElements import generate_elements
+from graphLayout import layout_positions
+from resultCache import ResultCache, cached_callback
 
-# Function to generate Cytoscape elements with different classes for filtered and connected nodes
-def generate_elements(dataframe, filtered_ids, connected_ids):
-    elements = []
-    valid_ids = set(dataframe['id'])
+# AIT inventory from the shared entity store (the sample data by default)
+STORE_NAME = 'ait'
+store = get_store(STORE_NAME)
 
-    for _, row in dataframe.iterrows():
-        node_class = (
-            'filtered' if row['id'] in filtered_ids else
-            'connected' if row['id'] in connected_ids else
-            'default'
-        )
-        status_class = 'online' if row['status'] == 'online' else 'offline'
-        elements.append({
-            'data': {'id': row['id'], 'label': row['ait_name']},
-            'classes': f"{node_class} {status_class}"
-        })
-    
-    for _, row in dataframe.iterrows():
-        for upstream_id in row['upstream']:
-            if upstream_id in valid_ids:
-                elements.append({'data': {'source': upstream_id, 'target': row['id']}})
-        for downstream_id in row['downstream']:
-            if downstream_id in valid_ids:
-                elements.append({'data': {'source': row['id'], 'target': downstream_id}})
-    
-    return elements
+# Callback results keyed on the normalised filters and the store version
+result_cache = ResultCache(max_bytes=64 * 1024 * 1024)
+
+# Swap in a new AIT DataFrame; the new store version invalidates the result cache
+def load_dataset(dataframe):
+    load_store(STORE_NAME, dataframe)
+
+# Flip one AIT online/offline without reloading; the count cube moves the row to
+# its new cell and its revision keeps cached summaries from going stale
+def set_ait_status(ait_id, status):
+    store = get_store(STORE_NAME)
+    store.set_value(store.position_of(ait_id), 'status', status)
 
 # Initialize Dash app
 app = dash.Dash(__name__)
+instrument(app)
 
 app.layout = html.Div([
     html.H1("AIT Network Graph"),
@@ -68,7 +54,7 @@ app.layout = html.Div([
                 html.Span("AIT Name:"),
                 dcc.Dropdown(
                     id='ait-name-filter',
-                    options=[{'label': ait_name, 'value': ait_name} for ait_name in df['ait_name'].unique()],
+                    options=[{'label': ait_name, 'value': ait_name} for ait_name in store.frame['ait_name'].unique()],
                     placeholder="Enter AIT name",
                     multi=False,
                     searchable=True,
@@ -78,19 +64,19 @@ app.layout = html.Div([
                 html.Span("Risk Factor:"),
                 dcc.Dropdown(id='risk-filter', options=[
                     {'label': 'All', 'value': 'all'}
-                ] + [{'label': f'Risk {i}', 'value': i} for i in sorted(df['risk_factor'].unique())],
+                ] + [{'label': f'Risk {i}', 'value': i} for i in sorted(store.frame['risk_factor'].unique())],
                 placeholder="Select risk factor", multi=False, value='all'),
                 
                 html.Br(), html.Span("Recovery Time:"),
                 dcc.Dropdown(id='recovery-filter', options=[
                     {'label': 'All', 'value': 'all'}
-                ] + [{'label': tier, 'value': tier} for tier in sorted(df['recovery_time'].unique())],
+                ] + [{'label': tier, 'value': tier} for tier in sorted(store.frame['recovery_time'].unique())],
                 placeholder="Select recovery time", multi=False, value='all'),
                 
                 html.Br(), html.Span("Business Name:"),
                 dcc.Dropdown(id='business-filter', options=[
                     {'label': 'All', 'value': 'all'}
-                ] + [{'label': name, 'value': name} for name in sorted(df['business_name'].unique())],
+                ] + [{'label': name, 'value': name} for name in sorted(store.frame['business_name'].unique())],
                 placeholder="Select business name", multi=False, value='all'),
             ]),
             
@@ -99,9 +85,10 @@ app.layout = html.Div([
                 children=[
                     cyto.Cytoscape(
                         id='cytoscape',
-                        elements=generate_elements(df, set(), set()),
+                        elements=generate_elements(store.graph, np.arange(len(store)),
+                                                   layout=layout_positions(store.graph, STORE_NAME, store.version)),
                         style={'width': '100%', 'height': '500px', 'position': 'relative'},
-                        layout={'name': 'cose'},
+                        layout={'name': 'preset'},  # positions are computed server-side
                         stylesheet=[
                             {'selector': '.filtered.online', 'style': {'background-color': 'blue', 'label': 'data(label)'}},
                             {'selector': '.filtered.offline', 'style': {'background-color': 'purple', 'label': 'data(label)'}},
@@ -135,21 +122,27 @@ app.layout = html.Div([
     Input('recovery-filter', 'value'),
     Input('business-filter', 'value')
 )
+@cached_callback(result_cache, lambda: get_store(STORE_NAME).data_version)
 def update_summary_boxes(ait_filter, risk_filter, recovery_filter, business_filter):
-    filtered_df = df
-    if ait_filter and ait_filter != 'all':
-        filtered_df = filtered_df[filtered_df['ait_name'] == ait_filter]
-    if risk_filter and risk_filter != 'all':
-        filtered_df = filtered_df[filtered_df['risk_factor'] == int(risk_filter)]
-    if recovery_filter and recovery_filter != 'all':
-        filtered_df = filtered_df[filtered_df['recovery_time'] == recovery_filter]
-    if business_filter and business_filter != 'all':
-        filtered_df = filtered_df[filtered_df['business_name'] == business_filter]
+    if risk_filter and risk_filter != 'all' and not isinstance(risk_filter, (list, dict)):
+        risk_filter = int(risk_filter)
+
+    store = get_store(STORE_NAME)
+    count_cube = store.cube
+
+    # Sum the matching slice of the count cube instead of rescanning the frame
+    filters = dict(risk_factor=risk_filter, recovery_time=recovery_filter, business_name=business_filter)
+    if normalise_filter_value(ait_filter) is None:
+        status_counts = count_cube.counts_by('status', **filters)
+    else:
+        ait_positions = store.filters.positions('ait_name', ait_filter)
+        status_counts = count_cube.counts_by_rows('status', ait_positions, **filters)
     
-    total_nodes = len(df)
-    filtered_nodes = len(filtered_df)
-    online_nodes = len(filtered_df[filtered_df['status'] == 'online'])
-    offline_nodes = len(filtered_df[filtered_df['status'] == 'offline'])
+    total_nodes = len(count_cube)
+    filtered_nodes = sum(status_counts.values())
+    observe('rows_filtered', filtered_nodes)
+    online_nodes = status_counts.get('online', 0)
+    offline_nodes = status_counts.get('offline', 0)
     
     return (
         f"Total Nodes: {total_nodes}",
@@ -158,5 +151,10 @@ def update_summary_boxes(ait_filter, risk_filter, recovery_filter, business_filt
         f"Offline Nodes: {offline_nodes}"
     )
 
+# Hit / miss / eviction counters of the result cache
+@app.server.route('/cache-stats')
+def cache_stats():
+    return jsonify(result_cache.stats())
+
 if __name__ == '__main__':
     app.run_server(debug=True)
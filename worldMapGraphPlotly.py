@@ -1,43 +1,135 @@
 import dash
-from dash import dcc, html
-from dash.dependencies import Input, Output
+from dash import Patch, dcc, html
+from dash.dependencies import Input, Output, State
 import plotly.graph_objs as go
+import numpy as np
 import pandas as pd
 
+from callbackMetrics import instrument, observe
+from entityStore import get_store, register_loader
+from mapClusters import (DEFAULT_VIEW, cached_density, cached_pyramid, cell_degrees, map_bounds, map_cell_px,
+                         update_view, viewport_bounds)
+
 # Sample data with city name, latitude, longitude, and count
-data = pd.DataFrame({
+STORE_NAME = 'cities'
+register_loader(STORE_NAME, lambda: (pd.DataFrame({
     'city': ['CityA', 'CityB', 'CityC', 'CityD', 'CityE'],
     'lat': [34.0522, 51.5074, -33.8688, 35.6895, -23.5505],
     'lon': [-118.2437, -0.1278, 151.2093, 139.6917, -46.6333],
     'count': [120, 75, 45, 150, 90]
-})
+}), {'id_column': None, 'label_column': 'city'}))
 
 app = dash.Dash(__name__)
+instrument(app)
 
 app.layout = html.Div(style={'height': '100vh'}, children=[
-    dcc.Graph(id='world-map', style={'height': '100%', 'width': '100%'})
+    dcc.RadioItems(
+        id='map-mode',
+        options=[{'label': 'Clusters', 'value': 'clusters'}, {'label': 'Density', 'value': 'density'}],
+        value='clusters',
+        inline=True
+    ),
+    dcc.Graph(id='world-map', style={'height': 'calc(100% - 30px)', 'width': '100%'}),
+    # Last known projection scale and center (relayoutData only carries changes)
+    dcc.Store(id='map-view', data=DEFAULT_VIEW)
 ])
 
-@app.callback(
-    Output('world-map', 'figure'),
-    Input('world-map', 'relayoutData')  # Placeholder for any interactive feature
-)
-def update_map(_):
-    fig = go.Figure()
 
-    fig.add_trace(go.Scattergeo(
-        lon=data['lon'],
-        lat=data['lat'],
-        text=data.apply(lambda row: f"City: {row['city']}<br>Lat: {row['lat']}<br>Lon: {row['lon']}<br>Count: {row['count']}", axis=1),
+# Markers for the clusters of the given view: one per grid cell in view, or the
+# points themselves when zoomed in far enough
+def cluster_trace(view):
+    store = get_store(STORE_NAME)
+    data = store.frame
+    clusters = cached_pyramid(STORE_NAME, store.version, data).query(
+        *viewport_bounds(view['scale'], view['lon'], view['lat']))
+
+    lat = pd.Series(np.round(clusters['lat'].astype(np.float64), 4))
+    lon = pd.Series(np.round(clusters['lon'].astype(np.float64), 4))
+    count = pd.Series(clusters['count']).astype(str)
+    single = clusters['points'] == 1
+
+    # Hover text built column-wise: city details for single cities, totals for clusters
+    labels = data['city'].iloc[np.where(single, clusters['position'], 0)].astype(str).reset_index(drop=True) \
+        if len(data) else pd.Series([], dtype=str)
+    city_text = 'City: ' + labels + '<br>Lat: ' + lat.astype(str) + '<br>Lon: ' + lon.astype(str) + '<br>Count: ' + count
+    cluster_text = pd.Series(clusters['points']).astype(str) + ' sites<br>Count: ' + count
+    text = np.where(single, city_text.to_numpy(dtype=object), cluster_text.to_numpy(dtype=object))
+
+    return go.Scattergeo(
+        lon=lon.to_numpy(),
+        lat=lat.to_numpy(),
+        text=text,
         mode='markers',
         marker=dict(
-            size=12,
+            # Single cities keep the original marker size, clusters grow with their count
+            size=np.where(single, 12, np.clip(8 + 4 * np.log10(np.maximum(clusters['count'], 1)), 8, 40)),
             color='darkred',  # Set all markers to deep red
             opacity=0.8,
             line=dict(width=1, color='black')
         ),
         hoverinfo='text'
-    ))
+    )
+
+
+
+# Summed count per grid cell in view as a heatmap layer of a tile map: the
+# browser rasterises it on the GPU, with each cell's weight spread over about
+# one cell width, instead of drawing a marker per cell
+def density_trace(view):
+    store = get_store(STORE_NAME)
+    lat, lon, weight, level = cached_density(STORE_NAME, store.version, store.frame).cells(*map_bounds(view))
+    text = 'Count: ' + pd.Series(weight.astype(np.int64)).astype(str) + '<br>Cell: ' + \
+        pd.Series(np.round(lat, 3)).astype(str) + ', ' + pd.Series(np.round(lon, 3)).astype(str)
+
+    return go.Densitymap(
+        lon=lon,
+        lat=lat,
+        z=np.log10(weight + 1),
+        radius=max(map_cell_px(cell_degrees(level), view['zoom']), 2),
+        text=text.to_numpy(dtype=object),
+        colorscale='YlOrRd',
+        colorbar=dict(title='log10 count'),
+        opacity=0.7,
+        hoverinfo='text'
+    )
+
+
+def map_trace(mode, view):
+    trace = density_trace(view) if mode == 'density' else cluster_trace(view)
+    observe('markers_emitted', len(trace.lat) if trace.lat is not None else 0)
+    return trace
+
+
+@app.callback(
+    Output('world-map', 'figure'),
+    Output('map-view', 'data'),
+    Input('world-map', 'relayoutData'),
+    Input('map-mode', 'value'),
+    State('map-view', 'data')
+)
+def update_map(relayout_data, mode, view):
+    # A new mode needs a new figure even though the last move is still in
+    # relayoutData (the density mode draws on a tile map, not a Scattergeo map)
+    same_mode = (view or {}).get('mode', mode) == mode
+    view = dict(update_view(view, relayout_data), mode=mode)
+
+    # Once the map has been moved only the markers change, the map stays as it is
+    if same_mode and relayout_data and any(key.startswith(('geo', 'map')) for key in relayout_data):
+        patch = Patch()
+        patch['data'][0] = map_trace(mode, view).to_plotly_json()
+        return patch, view
+
+    fig = go.Figure()
+    fig.add_trace(map_trace(mode, view))
+
+    if mode == 'density':
+        # Densitymap needs a tile map; it opens on the clusters map's center
+        fig.update_layout(
+            map=dict(style='carto-positron', center=dict(lat=view['lat'], lon=view['lon']), zoom=view['zoom']),
+            margin={"r": 0, "t": 0, "l": 0, "b": 0},
+            uirevision='constant'
+        )
+        return fig, view
 
     fig.update_geos(
         projection_type="natural earth",
@@ -70,7 +162,7 @@ def update_map(_):
         uirevision='constant'  # Keeps zoom and color consistent on updates
     )
 
-    return fig
+    return fig, view
 
 if __name__ == '__main__':
     app.run_server(debug=True)
@@ -0,0 +1,119 @@
+import gc
+import logging
+import os
+import time
+
+# Pages are built here in the master, never by a thread that could hold a
+# lock across fork()
+os.environ.setdefault('APP_SHELL_WARM_UP', '0')
+
+from flask import jsonify
+
+import appShell
+from entityStore import get_store, loaded_stores, register_loader
+from graphLayout import layout_positions
+from graphSnapshot import snapshot_loader
+
+# Source export and snapshot directory of the AIT inventory; without them the
+# network page keeps its own (synthetic) loader
+INVENTORY_ENV = 'AIT_INVENTORY'
+SNAPSHOT_DIR_ENV = 'AIT_SNAPSHOT_DIR'
+INVENTORY_STORE = 'ait-synthetic'  # store behind the shell's network page
+
+# smaps_rollup fields reported per process, in kB
+MEMORY_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+logger = logging.getLogger(__name__)
+
+_master_pid = None
+_preload_seconds = None
+
+
+# Memory of one process from /proc (Linux only), None if it is gone or unreadable
+def process_memory(pid):
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+    memory = {}
+    for line in lines[1:]:
+        field, _, value = line.partition(':')
+        if field in MEMORY_FIELDS:
+            memory[field.lower() + '_kb'] = int(value.split()[0])
+    return memory
+
+
+# Pids of the processes forked by `pid`
+def child_pids(pid):
+    children = []
+    try:
+        for task in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{task}/children') as f:
+                children.extend(int(child) for child in f.read().split())
+    except OSError:
+        return []
+    return sorted(children)
+
+
+# Everything the workers would otherwise each compute: page modules, layouts,
+# stores with their graph, filter index, count cube and node positions. Then
+# gc.freeze() moves all of it out of the collector's reach, so collections in
+# the workers never write to (and un-share) these pages.
+def preload():
+    start = time.perf_counter()
+    for page in appShell.pages.values():
+        page.load()
+
+    inventory = os.environ.get(INVENTORY_ENV)
+    if inventory:
+        # The graph comes from memory-mapped NumPy arrays: shared through the
+        # page cache and free of per-object refcounts
+        snapshot_dir = os.environ.get(SNAPSHOT_DIR_ENV) or os.path.join(os.path.dirname(inventory), 'snapshots')
+        register_loader(INVENTORY_STORE, snapshot_loader(inventory, snapshot_dir, INVENTORY_STORE))
+
+    appShell.warm_up(built_by='preload')
+    for name in loaded_stores():
+        store = get_store(name)
+        if store.graph is not None:
+            store.filters
+            store.cube
+            store.graph.unique_edges()
+            layout_positions(store.graph, name, store.version)
+
+    gc.collect()
+    gc.freeze()
+    return time.perf_counter() - start
+
+
+# GET /workers: the master and every worker with its memory. With the graph
+# shared, Pss per worker stays flat as workers are added and Private_Dirty
+# stays small.
+def workers():
+    pid = os.getpid()
+    master = _master_pid if _master_pid is not None and _master_pid != pid else None
+    pids = child_pids(master) if master is not None else [pid]
+    processes = [dict(pid=worker, current=worker == pid, **(process_memory(worker) or {})) for worker in pids]
+    return jsonify({
+        'master': dict(pid=master, **(process_memory(master) or {})) if master is not None else None,
+        'worker_count': len(processes),
+        'workers': processes,
+        'total_pss_kb': sum(process.get('pss_kb', 0) for process in processes),
+        'preload_seconds': _preload_seconds,
+        'frozen_objects': gc.get_freeze_count(),
+    })
+
+
+# WSGI app factory for a pre-fork server. With preloading (gunicorn
+# --preload, see gunicorn.conf.py) it runs once in the master and the workers
+# inherit the loaded data copy-on-write:
+#   gunicorn -c gunicorn.conf.py 'wsgi:create_app()'
+def create_app():
+    global _master_pid, _preload_seconds
+    _master_pid = os.getpid()
+    _preload_seconds = preload()
+    logger.info("Preloaded pages and stores %s in %.2fs", loaded_stores(), _preload_seconds)
+
+    server = appShell.app.server
+    server.add_url_rule('/workers', 'workers', workers)
+    return server